@@ -0,0 +1,244 @@
+"""
+Benchmark de los comandos de bot.py contra guilds sintéticos grandes.
+
+Genera archivos de datos de guild (por defecto 30 pistas x 10.000 usuarios),
+crea objetos falsos de Interaction/Guild/Member y llama directamente a los
+callbacks de los comandos de barra, sin conectarse a Discord. Para cada
+comando muestra percentiles de latencia y memoria asignada por llamada.
+
+Uso:
+    python bench_bot.py --tracks 30 --users 10000 --iterations 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_GUILD_ID = 424242
+
+
+# --- Objetos falsos de Discord (solo lo que usan los comandos) ---
+
+class FakeMember:
+    def __init__(self, member_id, name, guild=None, bot=False):
+        self.id = member_id
+        self.name = name
+        self.display_name = name
+        self.bot = bot
+        self.mention = f"<@{member_id}>"
+        self.guild = guild
+
+
+class FakeGuild:
+    def __init__(self, guild_id, member_count):
+        self.id = guild_id
+        self.name = f"bench-{guild_id}"
+        self.members = [FakeMember(1000 + i, f"piloto{i:05d}", guild=self) for i in range(member_count)]
+        self._members_by_id = {member.id: member for member in self.members}
+        self.member_count = len(self.members)
+
+    def get_member(self, member_id):
+        return self._members_by_id.get(member_id)
+
+
+class FakeResponse:
+    def __init__(self):
+        self._done = False
+
+    async def defer(self, **kwargs):
+        self._done = True
+
+    async def send_message(self, content=None, **kwargs):
+        self._done = True
+
+    async def edit_message(self, **kwargs):
+        self._done = True
+
+    def is_done(self):
+        return self._done
+
+
+class FakeFollowup:
+    async def send(self, content=None, **kwargs):
+        pass
+
+
+class FakeInteraction:
+    def __init__(self, guild, user):
+        self.guild = guild
+        self.guild_id = guild.id
+        self.user = user
+        self.response = FakeResponse()
+        self.followup = FakeFollowup()
+        self.extras = {}
+        self.command = None
+
+
+# --- Generación de datos sintéticos ---
+
+def format_time_ms(time_ms):
+    minutes, rest = divmod(time_ms, 60000)
+    seconds, millis = divmod(rest, 1000)
+    return f"{minutes}:{seconds:02d}.{millis:03d}"
+
+
+def generate_guild_file(data_dir, guild, track_keys, users, rng):
+    """Escribe data/<guild_id>.json con `users` tiempos por pista, en el formato que guarda bot.py."""
+    guild_data = {'language': 'es'}
+    members = guild.members[:users]
+    for track_key in track_keys:
+        entries = []
+        for member in members:
+            time_ms = rng.randint(90000, 150000)
+            entries.append({
+                "user_id": str(member.id),
+                "user_name": member.display_name,
+                "time": format_time_ms(time_ms),
+                "time_ms": time_ms,
+                "url_evidence": None,
+            })
+        entries.sort(key=lambda x: x["time_ms"])
+        guild_data[track_key] = entries
+    with open(os.path.join(data_dir, f"{guild.id}.json"), 'w') as f:
+        json.dump(guild_data, f)
+
+
+# --- Medición ---
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def command_calls(bot, guild, track_keys, rng):
+    """Devuelve (nombre, fábrica de corrutinas) para cada comando a medir."""
+    commands = {command.name: command for command in bot.bot.tree.get_commands()}
+
+    def member():
+        return rng.choice(guild.members)
+
+    def tt():
+        user = member()
+        # Tiempos en el rango de los existentes: unos mejoran el récord y otros no
+        time_str = format_time_ms(rng.randint(85000, 150000))
+        return commands['tt'].callback(FakeInteraction(guild, user), rng.choice(track_keys), time_str)
+
+    def tt_show():
+        return commands['tt-show'].callback(FakeInteraction(guild, member()), rng.choice(track_keys))
+
+    def tt_tracks():
+        return commands['tt-tracks'].callback(FakeInteraction(guild, member()))
+
+    def tt_user():
+        return commands['tt-user'].callback(FakeInteraction(guild, member()), str(member().id))
+
+    def tt_stats():
+        return commands['tt-stats'].callback(FakeInteraction(guild, member()), rng.choice(track_keys))
+
+    def tt_leaderboard():
+        return commands['tt-leaderboard'].callback(FakeInteraction(guild, member()))
+
+    def tt_leaderboard_user():
+        return commands['tt-leaderboard'].callback(FakeInteraction(guild, member()), str(member().id))
+
+    return [
+        ('tt', tt),
+        ('tt-show', tt_show),
+        ('tt-tracks', tt_tracks),
+        ('tt-stats', tt_stats),
+        ('tt-user', tt_user),
+        ('tt-leaderboard', tt_leaderboard),
+        ('tt-leaderboard <user>', tt_leaderboard_user),
+    ]
+
+
+async def run_benchmark(args):
+    import bot # Se importa aquí para que TT_DATA_DIR ya apunte al directorio del benchmark
+
+    rng = random.Random(args.seed)
+    guild = FakeGuild(BENCH_GUILD_ID, max(args.members, args.users))
+    track_keys = sorted(bot.TRACK_DISPLAY_NAMES)[:args.tracks]
+
+    start = time.perf_counter()
+    generate_guild_file(bot.DATA_DIR, guild, track_keys, args.users, rng)
+    print(f"Datos generados: {len(track_keys)} pistas x {args.users} usuarios en {time.perf_counter() - start:.2f}s")
+
+    # Igual que on_ready: el índice de miembros se construye al iniciar
+    start = time.perf_counter()
+    bot.member_indexes[guild.id] = bot.MemberSearchIndex.from_guild(guild)
+    print(f"Índice de miembros ({len(guild.members)}) construido en {time.perf_counter() - start:.2f}s")
+
+    calls = command_calls(bot, guild, track_keys, rng)
+
+    # Primera carga del guild (lectura y parseo del archivo)
+    start = time.perf_counter()
+    await bot.load_guild_data(str(guild.id))
+    print(f"Primera carga del guild: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    # Cada iteración ejecuta un /tt y luego los comandos de lectura, como en un evento real
+    latencies = {name: [] for name, _ in calls}
+    for _ in range(args.iterations):
+        for name, make_call in calls:
+            start = time.perf_counter()
+            await make_call()
+            latencies[name].append((time.perf_counter() - start) * 1000)
+
+    # Memoria asignada por llamada, en una pasada aparte para no distorsionar las latencias
+    allocations = {name: [] for name, _ in calls}
+    tracemalloc.start()
+    for _ in range(args.alloc_iterations):
+        for name, make_call in calls:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            await make_call()
+            _, peak = tracemalloc.get_traced_memory()
+            allocations[name].append((peak - before) / 1024)
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    await bot.guild_store.flush()
+    flush_ms = (time.perf_counter() - start) * 1000
+
+    header = f"{'COMANDO':<22} | {'N':>5} | {'p50 ms':>8} | {'p90 ms':>8} | {'p99 ms':>8} | {'max ms':>8} | {'KiB/llamada':>11}"
+    print()
+    print(header)
+    print('-' * len(header))
+    for name, _ in calls:
+        values = sorted(latencies[name])
+        alloc = statistics.mean(allocations[name]) if allocations[name] else 0.0
+        print(
+            f"{name:<22} | {len(values):>5} | {percentile(values, 50):>8.3f} | {percentile(values, 90):>8.3f} | "
+            f"{percentile(values, 99):>8.3f} | {values[-1] if values else 0:>8.3f} | {alloc:>11.1f}"
+        )
+    print(f"\nEscritura final del guild a disco: {flush_ms:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de los comandos de bot.py sin conexión a Discord.")
+    parser.add_argument('--tracks', type=int, default=30, help="Número de pistas con tiempos.")
+    parser.add_argument('--users', type=int, default=10000, help="Usuarios con tiempo en cada pista.")
+    parser.add_argument('--members', type=int, default=0, help="Miembros del guild falso (por defecto, igual a --users).")
+    parser.add_argument('--iterations', type=int, default=200, help="Iteraciones de medición de latencia.")
+    parser.add_argument('--alloc-iterations', type=int, default=20, help="Iteraciones de medición de memoria.")
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--data-dir', default=None, help="Directorio de datos (por defecto, uno temporal).")
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='ttbot-bench-')
+    os.environ['TT_DATA_DIR'] = data_dir
+    os.environ['TT_STORAGE_BACKEND'] = 'json' # Los datos sintéticos se generan como JSON
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    print(f"Directorio de datos del benchmark: {data_dir}")
+    asyncio.run(run_benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
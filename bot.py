@@ -5,24 +5,195 @@ from discord import app_commands
 from dotenv import load_dotenv
 import re
 import asyncio
+import bisect
+import copy
+import csv
+import functools
+import hashlib
+import heapq
+import io
 import json
+import math
+import sqlite3
+import string
+import sys
+import tempfile
+import time
+import weakref
+from collections import OrderedDict, defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from unidecode import unidecode 
+import numpy as np
+
+# Cargar variables de entorno desde .env
+load_dotenv()
+TOKEN = os.getenv('DISCORD_BOT_TOKEN')
 
 # --- CONFIGURACIÓN DE JSON PARA MÚLTIPLES SERVIDORES ---
-DATA_DIR = 'data' 
+DATA_DIR = os.getenv('TT_DATA_DIR', 'data')
 if not os.path.exists(DATA_DIR):
     os.makedirs(DATA_DIR)
 
-# Cargar variables de entorno desde .env
-load_dotenv()
-TOKEN = os.getenv('DISCORD_BOT_TOKEN')
+# --- MÉTRICAS (formato de texto de Prometheus) ---
+# Con TT_METRICS_PORT distinto de 0 se sirven en http://TT_METRICS_HOST:TT_METRICS_PORT/metrics
+METRICS_HOST = os.getenv('TT_METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('TT_METRICS_PORT', '0'))
+METRICS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0) # Segundos
+
+class Metrics:
+    """
+    Contadores, histogramas y medidores del proceso, exportados como texto
+    de Prometheus. Solo se actualizan desde el bucle de eventos (lo medido
+    en el hilo de E/S se registra al volver de él), así que no hay locks.
+    """
+
+    def __init__(self):
+        self._meta = {}   # nombre -> (tipo, descripción), en orden de declaración
+        self._series = {} # nombre -> {etiquetas: valor}; en histogramas el valor es [conteos por bucket, suma]
+        self._gauges = {} # nombre -> función que devuelve el valor actual
+        self._server = None
+
+    def describe(self, name, kind, help_text):
+        self._meta[name] = (kind, help_text)
+        self._series.setdefault(name, {})
+
+    def gauge(self, name, help_text, read_value):
+        self.describe(name, 'gauge', help_text)
+        self._gauges[name] = read_value
+
+    def inc(self, name, amount=1, **labels):
+        series = self._series[name]
+        key = tuple(sorted(labels.items()))
+        series[key] = series.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        series = self._series[name]
+        key = tuple(sorted(labels.items()))
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = [[0] * (len(METRICS_BUCKETS) + 1), 0.0] # El último conteo es +Inf
+        histogram[0][bisect.bisect_left(METRICS_BUCKETS, value)] += 1
+        histogram[1] += value
+
+    @staticmethod
+    def _format_labels(labels):
+        if not labels:
+            return ""
+        parts = []
+        for name, value in labels:
+            value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            parts.append(f'{name}="{value}"')
+        return "{" + ",".join(parts) + "}"
+
+    def render(self):
+        """Devuelve todas las métricas en el formato de exposición de texto de Prometheus."""
+        lines = []
+        for name, (kind, help_text) in self._meta.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == 'gauge':
+                lines.append(f"{name} {self._gauges[name]()}")
+            elif kind == 'counter':
+                for labels, value in self._series[name].items():
+                    lines.append(f"{name}{self._format_labels(labels)} {value}")
+            else:
+                for labels, (counts, total) in self._series[name].items():
+                    cumulative = 0
+                    for bound, count in zip(METRICS_BUCKETS + ('+Inf',), counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{self._format_labels(labels + (('le', bound),))} {cumulative}")
+                    lines.append(f"{name}_sum{self._format_labels(labels)} {total}")
+                    lines.append(f"{name}_count{self._format_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+    async def _handle_request(self, reader, writer):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # Descartar las cabeceras de la petición
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b'\r\n', b'\n', b''):
+                pass
+            parts = request_line.split()
+            if len(parts) >= 2 and parts[1].split(b'?')[0] == b'/metrics':
+                status, body = b'200 OK', self.render().encode('utf-8')
+            else:
+                status, body = b'404 Not Found', b'Not Found\n'
+            writer.write(
+                b'HTTP/1.1 ' + status + b'\r\n'
+                b'Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+                b'Content-Length: ' + str(len(body)).encode() + b'\r\n'
+                b'Connection: close\r\n\r\n' + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start_server(self, host=METRICS_HOST, port=METRICS_PORT):
+        """Inicia el endpoint HTTP /metrics en el bucle de eventos del bot (idempotente)."""
+        if self._server is None:
+            self._server = await asyncio.start_server(self._handle_request, host, port)
+            print(f"Métricas disponibles en http://{host}:{port}/metrics")
+
+
+metrics = Metrics()
+metrics.describe('ttbot_command_duration_seconds', 'histogram', 'Latencia de los comandos de barra, desde que llega la interacción hasta que termina el comando.')
+metrics.describe('ttbot_guild_command_seconds_total', 'counter', 'Segundos acumulados en comandos de barra por guild.')
+metrics.describe('ttbot_autocomplete_duration_seconds', 'histogram', 'Latencia de las funciones de autocompletado.')
+metrics.describe('ttbot_guild_cache_requests_total', 'counter', 'Peticiones de datos de guild a la caché en memoria, por resultado (hit, evicted, miss).')
+metrics.describe('ttbot_guild_loads_total', 'counter', 'Lecturas de datos de guild desde el backend de almacenamiento.')
+metrics.describe('ttbot_guild_load_duration_seconds', 'histogram', 'Duración de cada lectura de datos de guild (incluye la espera en el hilo de E/S).')
+metrics.describe('ttbot_guild_snapshot_duration_seconds', 'histogram', 'Tiempo de copia de un guild en el bucle de eventos antes de serializarlo en el hilo de E/S.')
+metrics.describe('ttbot_guild_saves_total', 'counter', 'Guilds escritos al backend de almacenamiento.')
+metrics.describe('ttbot_guild_flush_duration_seconds', 'histogram', 'Duración de cada escritura por lotes en el hilo de E/S.')
+metrics.describe('ttbot_journal_appends_total', 'counter', 'Tiempos guardados como una línea del diario del guild.')
+metrics.describe('ttbot_guild_bytes_written_total', 'counter', 'Bytes escritos al backend de almacenamiento (aproximado en SQLite).')
+metrics.describe('ttbot_guild_flush_errors_total', 'counter', 'Escrituras por lotes que fallaron y se reintentarán.')
+metrics.describe('ttbot_singleflight_requests_total', 'counter', 'Peticiones que lanzaron un cálculo (leader) o reutilizaron uno en curso (shared).')
+metrics.describe('ttbot_render_cache_requests_total', 'counter', 'Peticiones a la caché de embeds renderizados, por resultado (hit, miss).')
+
+def record_command_latency(interaction, command, status):
+    """Registra la latencia de un comando de barra a partir de la marca que deja InstrumentedCommandTree."""
+    started = interaction.extras.pop('tt_started', None)
+    if started is None or command is None:
+        return
+    elapsed = time.perf_counter() - started
+    metrics.observe('ttbot_command_duration_seconds', elapsed, command=command.qualified_name, status=status)
+    metrics.inc('ttbot_guild_command_seconds_total', elapsed, guild=str(interaction.guild_id) if interaction.guild_id else 'dm')
+
+def timed_autocomplete(func):
+    """Decorador para funciones de autocompletado que registra su latencia."""
+    @functools.wraps(func)
+    async def wrapper(interaction, current):
+        started = time.perf_counter()
+        try:
+            return await func(interaction, current)
+        finally:
+            metrics.observe('ttbot_autocomplete_duration_seconds', time.perf_counter() - started, autocomplete=func.__name__)
+    return wrapper
+
+class InstrumentedCommandTree(app_commands.CommandTree):
+    """
+    Árbol de comandos que marca el inicio de cada comando de barra en
+    interaction.extras. La latencia se registra al terminar, en
+    on_app_command_completion (éxito) o en on_error (fallo).
+    """
+
+    async def interaction_check(self, interaction):
+        if interaction.type is discord.InteractionType.application_command:
+            interaction.extras['tt_started'] = time.perf_counter()
+        return True
+
+    async def on_error(self, interaction, error):
+        record_command_latency(interaction, interaction.command, 'error')
+        await super().on_error(interaction, error)
 
 # Configurar intents
 intents = discord.Intents.default()
 intents.members = True 
 
 # Inicializar el bot con los intents
-bot = commands.Bot(command_prefix=None, intents=intents) 
+bot = commands.Bot(command_prefix=None, intents=intents, tree_cls=InstrumentedCommandTree) 
 
 # Expresión regular para validar el formato de tiempo (MM:SS.mmm o SS.mmm)
 TIME_REGEX = re.compile(r'^(?:(\d{1,2}):)?(\d{1,2})\.(\d{3})$')
@@ -103,6 +274,19 @@ TRACK_DISPLAY_NAMES = {
     "canon ferroviario": {"es": "Cañón Ferroviario", "en": "Whistlestop Summit"},
     "aldea arborea": {"es": "Aldea Arbórea", "en": "Acorn Heights"}, 
 }
+
+# Los nombres de visualización de cada idioma también son alias de su clave canónica: antes de que
+# el autocompletado enviara la clave, los servidores en inglés guardaban sus tiempos bajo "toad's factory",
+# "acorn heights", etc. No se pisan los alias ya definidos ni las claves canónicas (p. ej. "mario circuit").
+def add_display_name_aliases():
+    for storage_key, names_by_lang in TRACK_DISPLAY_NAMES.items():
+        for display_name in names_by_lang.values():
+            alias = unidecode(display_name).lower()
+            if alias not in TRACK_DISPLAY_NAMES:
+                STORAGE_KEY_MAP.setdefault(alias, storage_key)
+
+add_display_name_aliases()
+
 # --- DATOS DE IDIOMA DEL BOT ---
 LANG_DATA = {
     "es": {
@@ -113,8 +297,21 @@ LANG_DATA = {
         "response_guild_only": "Este comando solo puede usarse en un servidor.",
         "response_time_format_error": "El formato del tiempo es incorrecto. Usa `MM:SS.mmm` o `SS.mmm`.\nEjemplo: `01:23.456` o `59.123`.",
         "response_url_invalid": "La URL de evidencia proporcionada no parece ser válida. Asegúrate de que empiece con `http://` o `https://`.",
+        "response_track_invalid": "**{track_name}** no es un nombre de pista válido.",
         "response_time_updated": "¡Tiempo actualizado para **{user_name}** en **{track_name}** a `{time_str}`! ¡Nuevo Récord Personal!{evidence_text}",
         "response_time_not_better": "Tu tiempo `{time_str}` en **{track_name}** no es mejor que tu récord actual de `{entry_time}`.",
+        "command_tt_mention_passed_desc": "Mencionar a los pilotos superados (por defecto, solo se nombran).",
+        "tt_rank_reached": "📈 Entra en el puesto **#{rank}** de {total} en esta pista.",
+        "tt_rank_improved": "📈 Sube del puesto #{old_rank} al **#{rank}** de {total}.",
+        "tt_rank_kept": "📈 Mantiene el puesto **#{rank}** de {total}.",
+        "tt_passed": "Supera a {names}.",
+        "tt_passed_more": "{names} y {count} más",
+        "tt_medal_new": "{medal} ¡**{user_name}** consigue el {place} puesto en **{track_name}**!",
+        "tt_medal_down": "{medal} **{user_name}** baja al {place} puesto.",
+        "tt_medal_lost": "**{user_name}** sale del podio.",
+        "medal_place_1": "1er",
+        "medal_place_2": "2º",
+        "medal_place_3": "3er",
         "response_time_registered": "Tiempo `{time_str}` registrado para **{user_name}** en **{track_name}**.{evidence_text}",
         "evidence_prefix": " Evidencia: {url_evidence}",
 
@@ -132,6 +329,11 @@ LANG_DATA = {
         "ttshow_link_na": "N/A",
         "ttshow_evidence_section_title": "Evidencia (Zelda):",
         "ttshow_footer": "Ordenado: Mejores tiempos primero, luego sin tiempo (alfabéticamente).",
+        "ttshow_footer_participants": "Ordenado: Mejores tiempos primero.",
+        "ttshow_page": "Página {page}/{pages}",
+        "ttshow_non_participants": "Además, **{count}** miembro(s) sin tiempo en esta pista.",
+        "command_ttshow_participants_only_desc": "Establece a 'True' para listar solo a quienes tienen tiempo.",
+        "command_ttshow_page_desc": "Página a mostrar (por defecto la primera).",
 
         "command_tttracks_desc": "Muestra una lista de todas las pistas con tiempos registrados.",
         "tttracks_title": "Pistas con Tiempos Registrados",
@@ -169,6 +371,7 @@ LANG_DATA = {
         "bot_connected": "Bot conectado como {bot_user}!",
         "bot_id": "ID del bot: {bot_id}",
         "commands_synced_on_ready": "Comandos de barra sincronizados en on_ready.",
+        "commands_sync_skipped": "Comandos de barra sin cambios desde la última sincronización; no se sincronizan.",
         "error_sync_on_ready": "Error al sincronizar comandos de barra en on_ready: {error}",
         "error_token_not_found": "Error: No se encontró el token del bot en el archivo .env.",
         
@@ -176,6 +379,50 @@ LANG_DATA = {
         "command_language_lang_desc": "Elige el idioma (es/en).",
         "language_set_success": "Idioma del bot cambiado a **Español**.",
         "language_invalid": "Idioma no válido. Por favor, elige 'es' para Español o 'en' para Inglés.",
+
+        "response_admin_only": "Necesitas el permiso **Gestionar servidor** para usar este comando.",
+        "command_import_desc": "Importa tiempos desde un archivo CSV o JSON Lines (solo administradores).",
+        "command_import_file_desc": "CSV con columnas user_id, track, time, url_evidence (o JSON Lines con esas claves).",
+        "import_too_large": "El archivo es demasiado grande (máximo {max_kb} KB).",
+        "import_not_utf8": "El archivo debe estar codificado en UTF-8.",
+        "import_summary": "**Importación completada.** Tiempos nuevos: {registered} · Mejorados: {updated} · Sin mejora: {not_better} · Filas rechazadas: {rejected}",
+        "import_rejected_header": "Filas rechazadas:",
+        "import_rejected_row": "Línea {line}: {reason}",
+        "import_rejected_more": "... y {count} más.",
+        "import_reason_unreadable": "no se pudo leer la fila",
+        "import_reason_user": "ID de usuario no válido",
+        "import_reason_track": "pista desconocida",
+        "import_reason_time": "formato de tiempo no válido (usa MM:SS.mmm o SS.mmm)",
+        "import_reason_url": "URL de evidencia no válida",
+
+        "command_export_desc": "Exporta todos los tiempos del servidor a un archivo CSV o JSON Lines.",
+        "command_export_format_desc": "Formato del archivo (CSV por defecto).",
+        "export_no_data": "Todavía no hay tiempos registrados en este servidor.",
+        "export_ready": "Exportados {rows} tiempos de {tracks} pistas.",
+        "export_too_large": "El archivo exportado ({size_kb} KB) supera el límite de archivos de este servidor ({limit_kb} KB).",
+
+        "command_global_desc": "Muestra el ranking de una pista entre todos los servidores de la liga.",
+        "command_global_track_name_desc": "El nombre de la pista.",
+        "command_global_page_desc": "Página de resultados a mostrar (por defecto, la primera).",
+        "command_global_optin_desc": "Une o retira este servidor del ranking global de la liga (solo administradores).",
+        "command_global_optin_enabled_desc": "True para participar en /tt-global, False para dejar de participar.",
+        "global_optin_enabled": "Este servidor ahora participa en el ranking global (/tt-global).",
+        "global_optin_disabled": "Este servidor ya no participa en el ranking global.",
+        "global_no_guilds": "Ningún servidor participa todavía en el ranking global. Un administrador puede unirse con /tt-global-optin.",
+        "global_title": "🌐 Ranking global: **{track_name}**",
+        "global_col_server": "SERVIDOR",
+        "global_no_times": "No hay tiempos registrados para esta pista en los servidores de la liga.",
+        "global_footer": "Mejor tiempo de cada piloto en {guilds} servidor(es) de la liga.",
+        "command_stats_desc": "Muestra estadísticas de los tiempos de una pista.",
+        "command_stats_track_name_desc": "El nombre de la pista.",
+        "stats_title": "📊 Estadísticas: **{track_name}**",
+        "stats_summary_name": "Resumen",
+        "stats_summary": "Pilotos: **{count}**\nMejor: `{best}`\nMedia: `{mean}` (+{mean_gap})\nMediana: `{median}` (+{median_gap})\nDesviación estándar: `{std}`",
+        "stats_percentiles_name": "Percentiles",
+        "stats_histogram_name": "Distribución de tiempos",
+        "stats_footer": "Entre paréntesis, la diferencia con el 1er puesto.",
+        "stats_caller": "Tu tiempo `{time}` es el **#{rank}** de {count} (+{gap} del 1er puesto): más rápido que el **{percentile:.0f}%** de los pilotos.",
+        "stats_caller_no_time": "Aún no tienes tiempo en esta pista.",
     },
     "en": {
         "command_tt_desc": "Registers a time for a track.",
@@ -185,8 +432,21 @@ LANG_DATA = {
         "response_guild_only": "This command can only be used in a server.",
         "response_time_format_error": "Time format is incorrect. Use `MM:SS.mmm` or `SS.mmm`.\nExample: `01:23.456` or `59.123`.",
         "response_url_invalid": "The provided evidence URL does not seem valid. Make sure it starts with `http://` or `https://`.",
+        "response_track_invalid": "**{track_name}** is not a valid track name.",
         "response_time_updated": "Time updated for **{user_name}** on **{track_name}** to `{time_str}`! New Personal Best!{evidence_text}",
         "response_time_not_better": "Your time `{time_str}` on **{track_name}** is not better than your current record of `{entry_time}`.",
+        "command_tt_mention_passed_desc": "Mention the drivers you passed (by default they are only named).",
+        "tt_rank_reached": "📈 Enters at rank **#{rank}** of {total} on this track.",
+        "tt_rank_improved": "📈 Moves up from rank #{old_rank} to **#{rank}** of {total}.",
+        "tt_rank_kept": "📈 Keeps rank **#{rank}** of {total}.",
+        "tt_passed": "Passes {names}.",
+        "tt_passed_more": "{names} and {count} more",
+        "tt_medal_new": "{medal} **{user_name}** takes {place} place on **{track_name}**!",
+        "tt_medal_down": "{medal} **{user_name}** drops to {place} place.",
+        "tt_medal_lost": "**{user_name}** drops off the podium.",
+        "medal_place_1": "1st",
+        "medal_place_2": "2nd",
+        "medal_place_3": "3rd",
         "response_time_registered": "Time `{time_str}` registered for **{user_name}** on **{track_name}**.{evidence_text}",
         "evidence_prefix": " Evidence: {url_evidence}",
 
@@ -204,6 +464,11 @@ LANG_DATA = {
         "ttshow_link_na": "N/A",
         "ttshow_evidence_section_title": "Evidence (Zelda):",
         "ttshow_footer": "Sorted: Best times first, then no time (alphabetically).",
+        "ttshow_footer_participants": "Sorted: Best times first.",
+        "ttshow_page": "Page {page}/{pages}",
+        "ttshow_non_participants": "Also, **{count}** member(s) without a time on this track.",
+        "command_ttshow_participants_only_desc": "Set to 'True' to list only members with a time.",
+        "command_ttshow_page_desc": "Page to show (first page by default).",
 
         "command_tttracks_desc": "Shows a list of all registered tracks with times.",
         "tttracks_title": "Tracks with Registered Times",
@@ -241,6 +506,7 @@ LANG_DATA = {
         "bot_connected": "Bot connected as {bot_user}!",
         "bot_id": "Bot ID: {bot_id}",
         "commands_synced_on_ready": "Slash commands synchronized on_ready.",
+        "commands_sync_skipped": "Slash commands unchanged since the last sync; skipping sync.",
         "error_sync_on_ready": "Error synchronizing slash commands on_ready: {error}",
         "error_token_not_found": "Error: Bot token not found in .env file.",
 
@@ -248,44 +514,740 @@ LANG_DATA = {
         "command_language_lang_desc": "Choose the language (es/en).",
         "language_set_success": "Bot language set to **English**.",
         "language_invalid": "Invalid language. Please choose 'es' for Spanish or 'en' for English.",
+
+        "response_admin_only": "You need the **Manage Server** permission to use this command.",
+        "command_import_desc": "Imports times from a CSV or JSON Lines file (admins only).",
+        "command_import_file_desc": "CSV with columns user_id, track, time, url_evidence (or JSON Lines with those keys).",
+        "import_too_large": "The file is too large (maximum {max_kb} KB).",
+        "import_not_utf8": "The file must be UTF-8 encoded.",
+        "import_summary": "**Import finished.** New times: {registered} · Improved: {updated} · Not better: {not_better} · Rejected rows: {rejected}",
+        "import_rejected_header": "Rejected rows:",
+        "import_rejected_row": "Line {line}: {reason}",
+        "import_rejected_more": "... and {count} more.",
+        "import_reason_unreadable": "the row could not be read",
+        "import_reason_user": "invalid user ID",
+        "import_reason_track": "unknown track",
+        "import_reason_time": "invalid time format (use MM:SS.mmm or SS.mmm)",
+        "import_reason_url": "invalid evidence URL",
+
+        "command_export_desc": "Exports all of the server's times to a CSV or JSON Lines file.",
+        "command_export_format_desc": "File format (CSV by default).",
+        "export_no_data": "No times have been registered on this server yet.",
+        "export_ready": "Exported {rows} times from {tracks} tracks.",
+        "export_too_large": "The exported file ({size_kb} KB) exceeds this server's file size limit ({limit_kb} KB).",
+
+        "command_global_desc": "Shows a track's ranking across all servers in the league.",
+        "command_global_track_name_desc": "The name of the track.",
+        "command_global_page_desc": "Results page to show (the first one by default).",
+        "command_global_optin_desc": "Adds or removes this server from the league's global ranking (admins only).",
+        "command_global_optin_enabled_desc": "True to take part in /tt-global, False to stop taking part.",
+        "global_optin_enabled": "This server now takes part in the global ranking (/tt-global).",
+        "global_optin_disabled": "This server no longer takes part in the global ranking.",
+        "global_no_guilds": "No server takes part in the global ranking yet. An admin can join with /tt-global-optin.",
+        "global_title": "🌐 Global ranking: **{track_name}**",
+        "global_col_server": "SERVER",
+        "global_no_times": "No times registered for this track on the league's servers.",
+        "global_footer": "Best time of each driver across {guilds} league server(s).",
+        "command_stats_desc": "Shows statistics for a track's times.",
+        "command_stats_track_name_desc": "The name of the track.",
+        "stats_title": "📊 Statistics: **{track_name}**",
+        "stats_summary_name": "Summary",
+        "stats_summary": "Drivers: **{count}**\nBest: `{best}`\nMean: `{mean}` (+{mean_gap})\nMedian: `{median}` (+{median_gap})\nStandard deviation: `{std}`",
+        "stats_percentiles_name": "Percentiles",
+        "stats_histogram_name": "Time distribution",
+        "stats_footer": "In parentheses, the gap from 1st place.",
+        "stats_caller": "Your time `{time}` is **#{rank}** of {count} (+{gap} from 1st): faster than **{percentile:.0f}%** of drivers.",
+        "stats_caller_no_time": "You don't have a time on this track yet.",
     }
 }
 
 # --- FUNCIONES DE UTILIDAD PARA SOPORTE MULTI-SERVIDOR ---
 
-# Cargar datos desde JSON para un GUILD específico
-def load_guild_data(guild_id):
-    file_path = os.path.join(DATA_DIR, f"{guild_id}.json")
-    if os.path.exists(file_path):
-        with open(file_path, 'r') as f:
+# --- ALMACENAMIENTO DE DATOS DE GUILDS (BACKENDS INTERCAMBIABLES) ---
+# TT_STORAGE_BACKEND elige dónde se guardan los tiempos: 'json' (un archivo por guild, por defecto) o 'sqlite'.
+STORAGE_BACKEND = os.getenv('TT_STORAGE_BACKEND', 'json').lower()
+SQLITE_PATH = os.getenv('TT_SQLITE_PATH', os.path.join(DATA_DIR, 'ttbot.sqlite3'))
+
+class JsonGuildStorage:
+    """
+    Backend original: cada guild se guarda como un único JSON en data/<guild_id>.json.
+    Cada tiempo aceptado por /tt se añade además como una línea a data/<guild_id>.journal.jsonl;
+    al escribir el JSON completo el diario se compacta: sus líneas pasan a
+    data/<guild_id>.history.jsonl (historial de récords personales) y el diario se vacía.
+    Los métodos load/snapshot/write_batch/append_journal se ejecutan en el hilo de E/S;
+    journal_record en el bucle de eventos.
+    """
+
+    folds_journal = True # El diario crece hasta que un guardado completo lo compacta
+    writes_changed_rows = False # Cada guardado reescribe el archivo entero
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+
+    def _file_path(self, guild_id):
+        return os.path.join(self.data_dir, f"{guild_id}.json")
+
+    def _journal_path(self, guild_id):
+        return os.path.join(self.data_dir, f"{guild_id}.journal.jsonl")
+
+    def _history_path(self, guild_id):
+        return os.path.join(self.data_dir, f"{guild_id}.history.jsonl")
+
+    def load(self, guild_id):
+        file_path = self._file_path(guild_id)
+        if os.path.exists(file_path):
+            with open(file_path, 'r') as f:
+                try:
+                    guild_data = json.load(f)
+                    # Asegurar que el idioma esté presente, si no, establecer español por defecto
+                    if 'language' not in guild_data:
+                        guild_data['language'] = 'es'
+                except json.JSONDecodeError:
+                    print(f"Error al decodificar JSON para guild {guild_id}. Inicializando con datos vacíos.")
+                    guild_data = {'language': 'es'} # Default language if file is corrupt
+        else:
+            print(f"Archivo de datos no encontrado para guild {guild_id}. Inicializando con datos vacíos.")
+            guild_data = {'language': 'es'} # Default language for new guilds
+        self._replay_journal(guild_id, guild_data)
+        return guild_data
+
+    def _read_journal(self, guild_id):
+        """Registros del diario del guild. Descarta una última línea incompleta (escritura cortada por una caída)."""
+        journal_path = self._journal_path(guild_id)
+        if not os.path.exists(journal_path):
+            return []
+        with open(journal_path, 'r') as f:
+            content = f.read()
+        complete, _, partial = content.rpartition("\n")
+        if partial:
+            # Recortar la línea incompleta para que la próxima línea añadida no quede pegada a ella
+            with open(journal_path, 'r+') as f:
+                f.truncate(len(complete) + 1 if complete else 0)
+        records = []
+        for line in complete.splitlines():
             try:
-                guild_data = json.load(f)
-                # Asegurar que el idioma esté presente, si no, establecer español por defecto
-                if 'language' not in guild_data:
-                    guild_data['language'] = 'es'
-                return {k: v for k, v in guild_data.items()}
+                records.append(json.loads(line))
             except json.JSONDecodeError:
-                print(f"Error al decodificar JSON para guild {guild_id}. Inicializando con datos vacíos.")
-                return {'language': 'es'} # Default language if file is corrupt
-    else:
-        print(f"Archivo de datos no encontrado para guild {guild_id}. Inicializando con datos vacíos.")
-        return {'language': 'es'} # Default language for new guilds
+                print(f"Línea ilegible en el diario del guild {guild_id}; se omite.")
+        return records
+
+    def _replay_journal(self, guild_id, guild_data):
+        """Aplica sobre la foto cargada los tiempos del diario que aún no estaban compactados en ella."""
+        folded_seq = guild_data.get('journal_seq', 0)
+        entries_by_user = {} # clave de pista -> {user_id: entrada}; aquí las entradas aún son los dicts del JSON
+        replayed = 0
+        for record in self._read_journal(guild_id):
+            if record["seq"] <= folded_seq:
+                continue
+            storage_key, entry = record["track"], record["entry"]
+            track_entries = entries_by_user.get(storage_key)
+            if track_entries is None:
+                track_entries = entries_by_user[storage_key] = {e["user_id"]: e for e in guild_data.setdefault(storage_key, [])}
+            existing = track_entries.get(entry["user_id"])
+            if existing is None:
+                guild_data[storage_key].append(entry)
+                track_entries[entry["user_id"]] = entry
+            elif entry["time_ms"] < entry_time_ms(existing):
+                existing.clear()
+                existing.update(entry)
+            guild_data['journal_seq'] = max(guild_data.get('journal_seq', 0), record["seq"])
+            replayed += 1
+        if replayed:
+            guild_data.pop('medals', None) # El medallero guardado no incluye estos tiempos: se recalculará
+            print(f"Diario del guild {guild_id}: {replayed} tiempo(s) recuperado(s).")
+
+    def journal_record(self, seq, storage_key, entry):
+        return json.dumps({"seq": seq, "track": storage_key, "entry": entry.to_dict()}) + "\n"
+
+    def append_journal(self, guild_id, record):
+        """Añade un tiempo al diario del guild (O(1), sin reescribir el JSON) y devuelve los bytes escritos."""
+        with open(self._journal_path(guild_id), 'a') as f:
+            f.write(record)
+            f.flush()
+            os.fsync(f.fileno())
+        return len(record.encode('utf-8'))
+
+    def _fold_journal(self, guild_id, folded_seq):
+        """Tras escribir una foto que ya incluye el diario hasta folded_seq, mueve esas líneas al historial."""
+        journal_path = self._journal_path(guild_id)
+        if not os.path.exists(journal_path):
+            return
+        folded, remaining = [], []
+        for record in self._read_journal(guild_id):
+            (folded if record["seq"] <= folded_seq else remaining).append(json.dumps(record) + "\n")
+        if folded:
+            with open(self._history_path(guild_id), 'a') as f:
+                f.writelines(folded)
+                f.flush()
+                os.fsync(f.fileno())
+        if remaining:
+            tmp_path = f"{journal_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.writelines(remaining)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, journal_path)
+        else:
+            os.remove(journal_path)
+
+    def snapshot(self, captured):
+        """Serializa una copia de capture_guild_data al JSON de siempre."""
+        return json.dumps({
+            key: [TimeEntry.dict_from_state(state) for state in value] if isinstance(value, list) else value
+            for key, value in captured.items()
+        }, indent=4)
+
+    def _write(self, guild_id, captured):
+        """Serializa y escribe el JSON de forma atómica: un fallo a mitad de escritura no corrompe el archivo."""
+        payload = self.snapshot(captured)
+        folded_seq = captured.get('journal_seq', 0)
+        file_path = self._file_path(guild_id)
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+            size = os.fstat(f.fileno()).st_size
+        os.replace(tmp_path, file_path)
+        print(f"Datos guardados para guild {guild_id} en {file_path}")
+        self._fold_journal(guild_id, folded_seq)
+        return size
+
+    def write_batch(self, batch):
+        """Escribe cada guild del lote y devuelve el total de bytes escritos."""
+        return sum(self._write(guild_id, captured) for guild_id, captured, _ in batch)
+
+    def guild_ids(self):
+        """IDs de los guilds con archivo de datos (se ignoran otros JSON del directorio, como los de war-bot)."""
+        return [name[:-len('.json')] for name in os.listdir(self.data_dir) if name.endswith('.json') and name[:-len('.json')].isdigit()]
+
+
+class SqliteGuildStorage:
+    """
+    Backend SQLite: un registro por (guild, pista, usuario). Las claves que no
+    son pistas (idioma, etc.) se guardan como JSON en la tabla guilds. Los
+    tiempos de /tt se escriben directamente como una fila (más su línea en la
+    tabla history), sin diario que compactar, y un guardado completo solo
+    escribe las filas que cambiaron desde el anterior. La conexión solo se usa
+    desde el hilo de E/S.
+
+    Solo se lee el guild completo (load): las consultas por usuario o por
+    pista se resuelven en memoria sobre esa carga, por eso no hay índice por
+    (guild_id, user_id); idx_times_track_rank sirve a la carga ordenada.
+    """
+
+    folds_journal = False
+    writes_changed_rows = True # Acepta lotes con solo las filas modificadas
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS guilds (
+            guild_id TEXT PRIMARY KEY,
+            meta TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS times (
+            guild_id TEXT NOT NULL,
+            track_key TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            user_name TEXT,
+            time TEXT NOT NULL,
+            time_ms INTEGER NOT NULL,
+            url_evidence TEXT,
+            PRIMARY KEY (guild_id, track_key, user_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_times_track_rank ON times (guild_id, track_key, time_ms);
+        CREATE TABLE IF NOT EXISTS history (
+            guild_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            track_key TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            user_name TEXT,
+            time TEXT NOT NULL,
+            time_ms INTEGER NOT NULL,
+            url_evidence TEXT,
+            PRIMARY KEY (guild_id, seq)
+        ) WITHOUT ROWID;
+    """
+
+    # Si un JSON antiguo tiene dos entradas del mismo usuario en una pista, conservar la mejor
+    UPSERT_TIME = """
+        INSERT INTO times (guild_id, track_key, user_id, user_name, time, time_ms, url_evidence)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (guild_id, track_key, user_id) DO UPDATE SET
+            user_name = excluded.user_name,
+            time = excluded.time,
+            time_ms = excluded.time_ms,
+            url_evidence = excluded.url_evidence
+        WHERE excluded.time_ms < times.time_ms
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(self.SCHEMA)
+        return self._conn
+
+    @staticmethod
+    def _entry_from_row(user_id, user_name, time_str, time_ms, url_evidence):
+        if not isinstance(time_ms, (int, float)) or not math.isfinite(time_ms):
+            # Como diccionario: upgrade_guild_entries la aparta en 'quarantine'
+            return {"user_id": user_id, "user_name": user_name, "time": time_str, "time_ms": time_ms, "url_evidence": url_evidence}
+        return TimeEntry(user_id, user_name, time_ms, time_str, url_evidence)
+
+    def load(self, guild_id):
+        conn = self._connection()
+        row = conn.execute("SELECT meta FROM guilds WHERE guild_id = ?", (guild_id,)).fetchone()
+        guild_data = json.loads(row[0]) if row else {}
+        if 'language' not in guild_data:
+            guild_data['language'] = 'es'
+        # Los rankings, el índice por usuario y /tt-stats se construyen en memoria a partir de esta carga
+        # (idx_times_track_rank ya la devuelve ordenada)
+        rows = conn.execute(
+            "SELECT track_key, user_id, user_name, time, time_ms, url_evidence FROM times WHERE guild_id = ? ORDER BY track_key, time_ms",
+            (guild_id,)
+        )
+        for track_key, *rest in rows:
+            guild_data.setdefault(track_key, []).append(self._entry_from_row(*rest))
+        # Los tiempos añadidos con append_journal no actualizan meta: seguir numerando tras el último
+        last_seq = conn.execute("SELECT MAX(seq) FROM history WHERE guild_id = ?", (guild_id,)).fetchone()[0]
+        if last_seq is not None and last_seq > guild_data.get('journal_seq', 0):
+            guild_data['journal_seq'] = last_seq
+            guild_data.pop('medals', None) # Guardado antes de esos tiempos: se recalculará
+        return guild_data
+
+    def journal_record(self, seq, storage_key, entry):
+        return (seq, storage_key, entry.user_id, entry.user_name, entry.time, entry.time_ms, entry.url_evidence)
+
+    def append_journal(self, guild_id, record):
+        """Guarda un tiempo de /tt como una sola fila (y su línea de historial) en una transacción."""
+        conn = self._connection()
+        with conn:
+            conn.execute("INSERT INTO history VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (guild_id, *record))
+            conn.execute(self.UPSERT_TIME, (guild_id, *record[1:]))
+        return sum(len(str(value)) for value in record if value is not None)
+
+    def snapshot(self, captured):
+        """Convierte una copia de capture_guild_data en (meta JSON, filas de times)."""
+        meta = {}
+        rows = []
+        for key, value in captured.items():
+            if isinstance(value, list):
+                for state in value:
+                    entry = TimeEntry.dict_from_state(state)
+                    rows.append((key, entry["user_id"], entry["user_name"], entry["time"], entry["time_ms"], entry["url_evidence"]))
+            else:
+                meta[key] = value
+        return json.dumps(meta), rows
+
+    def _write_guild(self, conn, guild_id, meta, rows, replace=True):
+        conn.execute(
+            "INSERT INTO guilds (guild_id, meta) VALUES (?, ?) ON CONFLICT (guild_id) DO UPDATE SET meta = excluded.meta",
+            (guild_id, meta)
+        )
+        if replace:
+            conn.execute("DELETE FROM times WHERE guild_id = ?", (guild_id,))
+        conn.executemany(self.UPSERT_TIME, [(guild_id, *row) for row in rows])
+
+    def write_batch(self, batch):
+        """
+        Escribe el lote en una transacción y devuelve los bytes de datos enviados (aproximado).
+        Con replace, la copia es el guild completo y sustituye sus filas; si no, solo trae
+        las filas modificadas y se aplican sobre las existentes.
+        """
+        conn = self._connection()
+        size = 0
+        with conn: # Una sola transacción para todo el lote
+            for guild_id, captured, replace in batch:
+                meta, rows = self.snapshot(captured)
+                self._write_guild(conn, guild_id, meta, rows, replace=replace)
+                size += len(meta) + sum(len(str(value)) for row in rows for value in row if value is not None)
+        print(f"Datos guardados en {self.db_path} para {len(batch)} guild(s).")
+        return size
+
+    def guild_ids(self):
+        return [row[0] for row in self._connection().execute("SELECT guild_id FROM guilds")]
+
+
+def create_guild_storage():
+    if STORAGE_BACKEND == 'sqlite':
+        return SqliteGuildStorage(SQLITE_PATH)
+    return JsonGuildStorage(DATA_DIR)
+
+def migrate_json_to_sqlite(data_dir=DATA_DIR, db_path=SQLITE_PATH):
+    """
+    Copia (una sola vez) todos los data/<guild_id>.json existentes a la base SQLite.
+    Se puede repetir sin duplicar registros: se conserva el mejor tiempo de cada usuario.
+    """
+    source = JsonGuildStorage(data_dir)
+    target = SqliteGuildStorage(db_path)
+    guild_ids = source.guild_ids()
+    for guild_id in guild_ids:
+        captured = capture_guild_data(upgrade_guild_entries(guild_id, source.load(guild_id)))
+        # Sin replace: no borrar registros que ya estuvieran en SQLite
+        target.write_batch([(guild_id, captured, False)])
+    print(f"Migración completada: {len(guild_ids)} guild(s) copiados a {db_path}.")
+
+# --- CACHÉ EN MEMORIA DE DATOS POR GUILD (LRU + ESCRITURA DIFERIDA) ---
+GUILD_CACHE_MAX_GUILDS = int(os.getenv('TT_GUILD_CACHE_SIZE', '256'))
+GUILD_FLUSH_DELAY_SECONDS = float(os.getenv('TT_GUILD_FLUSH_DELAY', '5'))
+# Tiempos añadidos al diario de un guild tras los cuales se compacta en su archivo completo
+JOURNAL_COMPACT_LINES = int(os.getenv('TT_JOURNAL_COMPACT_LINES', '200'))
+
+# Un único hilo dedicado a leer/escribir archivos de guilds: mantiene el orden
+# de las escrituras y saca la E/S de disco del bucle de eventos de discord.py.
+GUILD_IO_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix='guild-io')
+
+class GuildStore:
+    """
+    Almacén de datos de guilds compartido por todo el proceso.
+    Mantiene en memoria los datos ya parseados de cada guild (con desalojo LRU)
+    y escribe en segundo plano solo los guilds modificados, agrupando varias
+    modificaciones seguidas en una sola escritura. Toda lectura y escritura
+    del backend (JSON o SQLite) se hace en GUILD_IO_EXECUTOR.
+    """
 
-# Guardar datos a JSON para un GUILD específico
-def save_guild_data(guild_id, guild_data):
-    file_path = os.path.join(DATA_DIR, f"{guild_id}.json")
-    with open(file_path, 'w') as f:
-        json.dump(guild_data, f, indent=4)
-    print(f"Datos guardados para guild {guild_id} en {file_path}")
+    def __init__(self, storage, max_guilds=GUILD_CACHE_MAX_GUILDS, flush_delay=GUILD_FLUSH_DELAY_SECONDS, executor=GUILD_IO_EXECUTOR):
+        self.storage = storage
+        self.max_guilds = max_guilds
+        self.flush_delay = flush_delay
+        self.executor = executor
+        self._cache = OrderedDict() # guild_id -> datos del guild, del menos al más reciente
+        self._dirty = set()         # guild_ids con cambios pendientes de escribir
+        self._evicted = {}          # guild_id -> datos desalojados de la caché con cambios aún sin escribir
+        self._loading = {}          # guild_id -> tarea de lectura en curso (para no leer dos veces el mismo archivo)
+        self._languages = {}        # guild_id -> idioma; se conserva aunque el guild salga de la caché
+        self._derived = {}          # guild_id -> estructuras derivadas de los datos (rankings, etc.); se descartan con el guild
+        self._versions = {}         # guild_id -> versión de los datos; sube con cada guardado
+        self._journal_pending = {}  # guild_id -> tiempos en el diario desde la última foto completa
+        self._changed_rows = {}     # guild_id -> {(pista, user_id)} modificados desde el último guardado, o None si hay que guardarlo entero
+        self._locks = weakref.WeakValueDictionary() # guild_id -> asyncio.Lock; desaparece cuando nadie lo usa
+        self._flush_event = None
+        self._flush_task = None
+
+    async def get(self, guild_id):
+        """Devuelve los datos del guild desde memoria, leyéndolos de disco solo si no están en caché."""
+        guild_id = str(guild_id)
+        guild_data = self._cache.get(guild_id)
+        if guild_data is not None:
+            metrics.inc('ttbot_guild_cache_requests_total', result='hit')
+            self._cache.move_to_end(guild_id)
+            return guild_data
+
+        guild_data = self._evicted.pop(guild_id, None)
+        if guild_data is not None:
+            metrics.inc('ttbot_guild_cache_requests_total', result='evicted')
+            # Desalojado con cambios sin escribir: recuperarlo de memoria, no de disco
+            self._cache[guild_id] = guild_data
+            self._dirty.add(guild_id)
+            self._evict()
+            return guild_data
+
+        metrics.inc('ttbot_guild_cache_requests_total', result='miss')
+        task = self._loading.get(guild_id)
+        if task is None:
+            task = asyncio.create_task(self._load(guild_id))
+            self._loading[guild_id] = task
+        return await task
+
+    async def _load(self, guild_id):
+        try:
+            loop = asyncio.get_running_loop()
+            started = time.perf_counter()
+            raw_data = await loop.run_in_executor(self.executor, self.storage.load, guild_id)
+            metrics.inc('ttbot_guild_loads_total')
+            metrics.observe('ttbot_guild_load_duration_seconds', time.perf_counter() - started)
+            guild_data = upgrade_guild_entries(guild_id, raw_data)
+            if guild_id in self._cache: # Alguien guardó datos nuevos mientras se leía el archivo
+                return self._cache[guild_id]
+            self._derived.pop(guild_id, None)
+            self._cache[guild_id] = guild_data
+            if canonicalize_guild_tracks(guild_data):
+                # Persistir la fusión de alias para no repetirla en la próxima carga
+                self._mark_dirty(guild_id, None)
+            if not has_medal_view(guild_data):
+                # Recalcular el medallero al cargar y no en un comando de lectura: así no cambia
+                # la versión en mitad de un render. Se guarda con la próxima escritura.
+                rebuild_medal_view(guild_id, guild_data)
+                self._mark_dirty(guild_id, ())
+            self._languages[guild_id] = guild_data.get('language', 'es')
+            self._evict()
+            return guild_data
+        finally:
+            self._loading.pop(guild_id, None)
+
+    def lock(self, guild_id):
+        """
+        Lock del guild para secuencias leer → modificar → guardar. Solo
+        serializa las escrituras de un mismo guild; los demás siguen en paralelo.
+        """
+        guild_id = str(guild_id)
+        lock = self._locks.get(guild_id)
+        if lock is None:
+            lock = self._locks[guild_id] = asyncio.Lock()
+        return lock
+
+    def derived(self, guild_id, create=True):
+        """
+        Diccionario para estructuras calculadas a partir de los datos del guild; vive mientras el guild esté en caché.
+        Con create=False devuelve None si el guild aún no tiene ninguna (p. ej. en eventos de guilds sin cargar).
+        """
+        if not create:
+            return self._derived.get(str(guild_id))
+        return self._derived.setdefault(str(guild_id), {})
+
+    def version(self, guild_id):
+        """Versión de los datos del guild en este proceso; cambia cada vez que se guardan."""
+        return self._versions.get(str(guild_id), 0)
+
+    def stats(self):
+        """Guilds en caché y guilds con cambios pendientes de escribir (para las métricas)."""
+        return {'cached': len(self._cache), 'pending': len(self._dirty) + len(self._evicted)}
+
+    def language(self, guild_id, default='es'):
+        """Devuelve el idioma conocido del guild sin tocar disco (default si aún no se ha cargado)."""
+        return self._languages.get(str(guild_id), default)
+
+    def put(self, guild_id, guild_data, changed_rows=None):
+        """
+        Actualiza los datos del guild en memoria y los marca para escribirse a disco más tarde.
+        changed_rows indica qué entradas ({(clave de pista, user_id)}) cambiaron, para que
+        los backends que lo admiten no reescriban el resto; None guarda el guild entero.
+        """
+        guild_id = str(guild_id)
+        self._evicted.pop(guild_id, None)
+        if self._cache.get(guild_id) is not guild_data:
+            self._derived.pop(guild_id, None) # Datos reemplazados: las estructuras derivadas ya no valen
+            changed_rows = None
+        self._cache[guild_id] = guild_data
+        self._cache.move_to_end(guild_id)
+        self._languages[guild_id] = guild_data.get('language', 'es')
+        self._versions[guild_id] = self._versions.get(guild_id, 0) + 1
+        self._mark_dirty(guild_id, changed_rows)
+        self._evict()
+
+    def _mark_dirty(self, guild_id, changed_rows):
+        """Marca un guild en caché para escribirse, acumulando sus filas modificadas (None: entero)."""
+        if changed_rows is None:
+            self._changed_rows[guild_id] = None
+        elif self._changed_rows.get(guild_id, set()) is not None:
+            self._changed_rows.setdefault(guild_id, set()).update(changed_rows)
+        self._dirty.add(guild_id)
+        if self._flush_event is not None:
+            self._flush_event.set()
+
+    async def append_journal(self, guild_id, guild_data, storage_key, entry):
+        """
+        Guarda un tiempo aceptado añadiéndolo al diario del guild en lugar de
+        reescribir todos sus datos. Cada JOURNAL_COMPACT_LINES tiempos el guild
+        se marca para una escritura completa, que compacta el diario.
+        """
+        guild_id = str(guild_id)
+        seq = guild_data.get('journal_seq', 0) + 1
+        guild_data['journal_seq'] = seq
+        record = self.storage.journal_record(seq, storage_key, entry) # Serializar en el bucle, como snapshot
+        if self._cache.get(guild_id) is not guild_data:
+            self.put(guild_id, guild_data) # Datos que no están en caché: guardarlos completos
+            return
+        changed_rows = {(storage_key, entry.user_id)}
+        self._cache.move_to_end(guild_id)
+        self._versions[guild_id] = self._versions.get(guild_id, 0) + 1
+
+        loop = asyncio.get_running_loop()
+        try:
+            size = await loop.run_in_executor(self.executor, self.storage.append_journal, guild_id, record)
+        except Exception as e:
+            print(f"Error al escribir el diario del guild {guild_id}: {e}. Se guardará el archivo completo.")
+            self.put(guild_id, guild_data, changed_rows)
+            return
+        metrics.inc('ttbot_journal_appends_total')
+        metrics.inc('ttbot_guild_bytes_written_total', size)
+        if self.storage.folds_journal:
+            pending = self._journal_pending.get(guild_id, 0) + 1
+            self._journal_pending[guild_id] = pending
+            if pending >= JOURNAL_COMPACT_LINES and guild_id not in self._dirty:
+                self.put(guild_id, guild_data, changed_rows)
+
+    def _evict(self):
+        while len(self._cache) > self.max_guilds:
+            guild_id, guild_data = self._cache.popitem(last=False)
+            self._derived.pop(guild_id, None)
+            if guild_id in self._dirty:
+                # No perder cambios pendientes al desalojar un guild de la caché
+                self._dirty.discard(guild_id)
+                self._evicted[guild_id] = guild_data
+                if self._flush_event is not None:
+                    self._flush_event.set()
+
+    def _take_pending(self, only=None):
+        """Copia y retira de la lista de pendientes los guilds a escribir."""
+        pending = {guild_id: self._cache[guild_id] for guild_id in self._dirty}
+        pending.update(self._evicted)
+        if only is not None:
+            pending = {guild_id: data for guild_id, data in pending.items() if guild_id in only}
+        batch = []
+        for guild_id, guild_data in pending.items():
+            # Copiar aquí (en el hilo del bucle) para no leer el dict mientras otro comando lo modifica;
+            # la serialización, que es lo costoso, se hace con la copia en el hilo de E/S
+            started = time.perf_counter()
+            changed_rows = self._changed_rows.pop(guild_id, None) if self.storage.writes_changed_rows else None
+            batch.append((guild_id, capture_guild_data(guild_data, changed_rows), changed_rows is None))
+            metrics.observe('ttbot_guild_snapshot_duration_seconds', time.perf_counter() - started)
+            self._journal_pending.pop(guild_id, None) # La foto ya incluye todo el diario
+            self._changed_rows.pop(guild_id, None)
+            self._dirty.discard(guild_id)
+            self._evicted.pop(guild_id, None)
+        return pending, batch
+
+    def _restore_pending(self, pending):
+        for guild_id, guild_data in pending.items():
+            self._changed_rows[guild_id] = None # No se sabe qué llegó a escribirse: la próxima vez, entero
+            if self._cache.get(guild_id) is guild_data:
+                self._dirty.add(guild_id)
+            elif guild_id not in self._cache:
+                self._evicted.setdefault(guild_id, guild_data)
+
+    async def flush(self, only=None):
+        """Escribe a disco (en el hilo de E/S) los guilds con cambios pendientes, o solo los indicados."""
+        pending, batch = self._take_pending(only)
+        if not batch:
+            return
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            size = await loop.run_in_executor(self.executor, self.storage.write_batch, batch)
+        except Exception:
+            metrics.inc('ttbot_guild_flush_errors_total')
+            self._restore_pending(pending)
+            raise
+        metrics.observe('ttbot_guild_flush_duration_seconds', time.perf_counter() - started)
+        metrics.inc('ttbot_guild_saves_total', len(batch))
+        metrics.inc('ttbot_guild_bytes_written_total', size)
+
+    def flush_sync(self):
+        """Escribe todo lo pendiente y espera a que termine; solo para usar cuando ya no hay bucle de eventos."""
+        # Al salir, compactar también los diarios de los guilds en caché
+        self._dirty.update(guild_id for guild_id in self._journal_pending if guild_id in self._cache)
+        pending, batch = self._take_pending()
+        if not batch:
+            return
+        try:
+            # También en el hilo de E/S: una escritura que siga en curso allí no se cruza con esta
+            self.executor.submit(self.storage.write_batch, batch).result()
+        except Exception:
+            self._restore_pending(pending)
+            raise
+
+    def start(self):
+        """Inicia la tarea en segundo plano que escribe los guilds modificados (idempotente)."""
+        if self._flush_task is not None and not self._flush_task.done():
+            return
+        self._flush_event = asyncio.Event()
+        if self._dirty or self._evicted:
+            self._flush_event.set()
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await self._flush_event.wait()
+            # Esperar un poco para agrupar varias modificaciones en una sola escritura por guild
+            await asyncio.sleep(self.flush_delay)
+            self._flush_event.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error al escribir datos de guilds a disco: {e}")
+                self._flush_event.set()
+
+
+guild_store = GuildStore(create_guild_storage())
+metrics.gauge('ttbot_guild_cache_guilds', 'Guilds con datos en la caché en memoria.', lambda: guild_store.stats()['cached'])
+metrics.gauge('ttbot_guild_pending_writes', 'Guilds con cambios pendientes de escribir.', lambda: guild_store.stats()['pending'])
+
+# Cargar datos de un GUILD específico (desde la caché en memoria; el disco solo se lee en el hilo de E/S)
+async def load_guild_data(guild_id):
+    return await guild_store.get(guild_id)
+
+# Guardar datos de un GUILD específico. Por defecto la escritura a disco se hace
+# en segundo plano; con wait=True se espera a que quede escrita. changed_rows: ver GuildStore.put.
+async def save_guild_data(guild_id, guild_data, wait=False, changed_rows=None):
+    guild_store.put(guild_id, guild_data, changed_rows)
+    if wait:
+        await guild_store.flush(only={str(guild_id)})
+
+# Guardar un único tiempo aceptado (/tt) como una línea del diario del guild
+async def save_time_entry(guild_id, guild_data, storage_key, entry):
+    await guild_store.append_journal(guild_id, guild_data, storage_key, entry)
+
+# --- LOCALIZACIÓN ---
+
+class Localizer:
+    """
+    Textos de un idioma con las plantillas de LANG_DATA ya preparadas
+    (con español como respaldo para claves que falten), para que obtener
+    un texto no requiera leer datos del guild.
+    """
+
+    def __init__(self, lang):
+        self.lang = lang
+        self._templates = {}
+        for key, text in {**LANG_DATA['es'], **LANG_DATA.get(lang, {})}.items():
+            has_fields = any(field_name is not None for _, field_name, _, _ in string.Formatter().parse(text))
+            # Las plantillas sin campos se devuelven tal cual, sin pasar por str.format
+            self._templates[key] = text.format if has_fields else text
+
+    def __call__(self, key, **kwargs):
+        template = self._templates.get(key)
+        if template is None:
+            return f"MISSING_STRING_{key}"
+        if isinstance(template, str):
+            return template
+        return template(**kwargs)
+
+
+LOCALIZERS = {lang: Localizer(lang) for lang in LANG_DATA}
+
+# Obtener el idioma de un guild (español si no hay guild)
+def get_guild_language(guild_id):
+    if guild_id is None:
+        return 'es'
+    return guild_store.language(guild_id)
+
+# Obtener el localizador para un guild; resolverlo una vez por interacción
+def get_localizer(guild_id):
+    return LOCALIZERS.get(get_guild_language(guild_id), LOCALIZERS['es'])
+
+# Obtener el localizador de un guild cargando antes sus datos: con la caché fría,
+# get_localizer aún no conoce el idioma del guild y devolvería el de por defecto
+async def load_localizer(guild_id):
+    if guild_id is not None:
+        await load_guild_data(guild_id)
+    return get_localizer(guild_id)
 
 # Obtener la cadena de texto localizada
 def get_localized_string(guild_id, key, **kwargs):
-    guild_data = load_guild_data(guild_id)
-    lang = guild_data.get('language', 'es') # Default to Spanish if not set
-    
-    # Si la clave no existe en el idioma específico, intentar en español como fallback
-    text = LANG_DATA.get(lang, LANG_DATA['es']).get(key, LANG_DATA['es'].get(key, f"MISSING_STRING_{key}"))
-    return text.format(**kwargs)
+    return get_localizer(guild_id)(key, **kwargs)
+
+# Texto en español de un comando u opción, marcado con su clave para que LangDataTranslator lo traduzca
+def command_text(key):
+    return app_commands.locale_str(LANG_DATA['es'][key], key=key)
+
+class LangDataTranslator(app_commands.Translator):
+    """
+    Traduce las descripciones de comandos y opciones con LANG_DATA según el
+    idioma del cliente de Discord de cada usuario. Discord recibe todas las
+    traducciones al sincronizar, así que cambiar de idioma no requiere resincronizar.
+    """
+
+    async def translate(self, string, locale, context):
+        key = string.extras.get('key')
+        lang = locale.value.split('-')[0] # 'en-US' -> 'en', 'es-ES' -> 'es'
+        if key is None or lang == 'es' or lang not in LANG_DATA:
+            return None # Se usa el texto por defecto (español)
+        return LANG_DATA[lang].get(key)
 
 
 # VALIDACIÓN DE URL 
@@ -309,7 +1271,149 @@ def time_to_ms(time_str):
     milliseconds = int(match.group(3))
     return (minutes * 60 * 1000) + (seconds * 1000) + milliseconds
 
+# Tiempo en ms de una entrada guardada; las antiguas solo tienen el texto
+def entry_time_ms(data):
+    return data["time_ms"] if "time_ms" in data else time_to_ms(data["time"])
+
+# Texto canónico de un tiempo en milisegundos: "1:23.456", o "59.123" por debajo del minuto
+def format_time_ms(time_ms):
+    minutes, rest = divmod(time_ms, 60000)
+    seconds, milliseconds = divmod(rest, 1000)
+    if minutes:
+        return f"{minutes}:{seconds:02d}.{milliseconds:03d}"
+    return f"{seconds}.{milliseconds:03d}"
+
+# --- ENTRADAS DE TIEMPO EN MEMORIA ---
+class TimeEntry:
+    """
+    Mejor tiempo de un usuario en una pista. Sustituye en memoria al dict de
+    cinco claves del JSON: los IDs y nombres se internan (un mismo usuario
+    comparte el objeto en todas las pistas y guilds) y el texto del tiempo
+    solo se guarda si difiere del canónico (format_time_ms); si no, se genera
+    al pedirlo. to_dict devuelve el formato de siempre para el JSON.
+    """
+
+    __slots__ = ('user_id', 'user_name', 'time_ms', 'url_evidence', '_time')
+
+    def __init__(self, user_id, user_name, time_ms, time_str=None, url_evidence=None):
+        self.set_time(user_name, time_ms, time_str, url_evidence)
+        self.user_id = sys.intern(user_id)
+
+    def set_time(self, user_name, time_ms, time_str=None, url_evidence=None):
+        """Reemplaza el tiempo de la entrada en su sitio (nuevo récord personal)."""
+        self.user_name = sys.intern(user_name) if user_name else user_name
+        self.time_ms = time_ms
+        self.url_evidence = url_evidence or None
+        self._time = time_str if time_str is not None and time_str != format_time_ms(time_ms) else None
+
+    @property
+    def time(self):
+        """Tiempo tal como lo escribió el usuario."""
+        return self._time if self._time is not None else format_time_ms(self.time_ms)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["user_id"], data.get("user_name"), entry_time_ms(data), data["time"], data.get("url_evidence"))
+
+    def state(self):
+        """Campos de la entrada como tupla inmutable, para serializarla en otro hilo."""
+        return (self.user_id, self.user_name, self.time_ms, self._time, self.url_evidence)
+
+    @staticmethod
+    def dict_from_state(state):
+        user_id, user_name, time_ms, time_str, url_evidence = state
+        return {
+            "user_id": user_id,
+            "user_name": user_name,
+            "time": time_str if time_str is not None else format_time_ms(time_ms),
+            "time_ms": time_ms,
+            "url_evidence": url_evidence
+        }
+
+    def to_dict(self):
+        return self.dict_from_state(self.state())
+
+    def __repr__(self):
+        return f"TimeEntry({self.user_id!r}, {self.time!r})"
+
+# Convertir las entradas leídas del JSON a TimeEntry (y añadir 'time_ms' a las
+# guardadas antes de que existiera ese campo). Se hace una sola vez al cargar el guild.
+# Las entradas guardadas cuyo tiempo no se puede interpretar (time_ms no finito, p. ej. un
+# "time" que no cumple TIME_REGEX) no se cargan en la pista: se apartan en guild_data['quarantine']
+# ({clave de pista: {user_id: entrada original}}) para no tumbar el guild ni perderlas al guardar.
+def upgrade_guild_entries(guild_id, guild_data):
+    quarantined = 0
+    for key, entries in list(guild_data.items()):
+        if not isinstance(entries, list):
+            continue
+        upgraded = []
+        for entry in entries:
+            if not isinstance(entry, TimeEntry):
+                time_ms = entry_time_ms(entry)
+                if not isinstance(time_ms, (int, float)) or not math.isfinite(time_ms):
+                    guild_data.setdefault('quarantine', {}).setdefault(key, {})[entry["user_id"]] = entry
+                    quarantined += 1
+                    continue
+                entry = TimeEntry.from_dict(entry)
+            upgraded.append(entry)
+        guild_data[key] = upgraded
+    if quarantined:
+        print(f"Guild {guild_id}: {quarantined} tiempo(s) con formato no válido apartados en 'quarantine'.")
+    return guild_data
+
+# Copia de los datos del guild que el hilo de E/S puede serializar mientras el bucle
+# sigue modificando el original: las entradas como tuplas inmutables y el resto copiado.
+# Con changed_rows ({(clave de pista, user_id)}) solo se copian esas entradas.
+def capture_guild_data(guild_data, changed_rows=None):
+    if changed_rows is None:
+        return {
+            key: [entry.state() for entry in value] if isinstance(value, list) else copy.deepcopy(value)
+            for key, value in guild_data.items()
+        }
+    captured = {key: copy.deepcopy(value) for key, value in guild_data.items() if not isinstance(value, list)}
+    changed_by_track = defaultdict(set)
+    for storage_key, user_id in changed_rows:
+        changed_by_track[storage_key].add(user_id)
+    for storage_key, user_ids in changed_by_track.items():
+        captured[storage_key] = [entry.state() for entry in guild_data.get(storage_key, []) if entry.user_id in user_ids]
+    return captured
+
+# --- CANONICALIZACIÓN DE PISTAS AL CARGAR ---
+# Versión del mapa de alias aplicada a los datos guardados; subirla si cambia STORAGE_KEY_MAP
+TRACK_SCHEMA_VERSION = 2 # 2: alias de los nombres de visualización de cada idioma
+
+def canonicalize_guild_tracks(guild_data):
+    """
+    Fusiona una sola vez las pistas guardadas bajo alias antiguos (p. ej. "fabrica de toad")
+    en su clave canónica, conservando el mejor tiempo de cada usuario, y marca el guild
+    como normalizado. Devuelve True si hubo que fusionar o descartar entradas.
+    """
+    if guild_data.get('schema', 0) >= TRACK_SCHEMA_VERSION:
+        return False
+
+    changed = False
+    merged = {}
+    for json_track_key in [key for key, entries in guild_data.items() if isinstance(entries, list)]:
+        storage_key = normalize_track_name(json_track_key)
+        changed = changed or storage_key != json_track_key
+        best_by_user = merged.setdefault(storage_key, {})
+        for entry in guild_data.pop(json_track_key):
+            current = best_by_user.get(entry.user_id)
+            if current is not None:
+                changed = True # Usuario repetido en la pista
+            if current is None or entry.time_ms < current.time_ms:
+                best_by_user[entry.user_id] = entry
+
+    for storage_key, best_by_user in merged.items():
+        guild_data[storage_key] = sorted(best_by_user.values(), key=lambda x: x.time_ms)
+    if changed:
+        # Los podios guardados pueden haber cambiado con la fusión: se recalculan cuando se necesiten
+        guild_data.pop('medals', None)
+    guild_data['schema'] = TRACK_SCHEMA_VERSION
+    return changed
+
 # --- FUNCIÓN DE NORMALIZACIÓN DE PISTAS (para clave de almacenamiento) ---
+@functools.lru_cache(maxsize=4096)
 def normalize_track_name(input_name):
     """
     Normaliza el nombre de una pista para usarlo como clave de almacenamiento:
@@ -330,71 +1434,691 @@ def get_display_track_name(storage_key, lang_code):
         return track_names_by_lang.get(lang_code, track_names_by_lang.get('es', storage_key.capitalize()))
     return storage_key.capitalize() # Fallback si la clave no está en TRACK_DISPLAY_NAMES
 
+# --- RANKING POR PISTA ---
+RankChange = namedtuple('RankChange', ['old_rank', 'new_rank', 'passed_count', 'passed_user_ids'])
+
+class TrackRanking:
+    """
+    Ranking en memoria de una pista: una lista ordenada de (time_ms, user_id)
+    con el mejor tiempo de cada usuario, más un mapa usuario -> tiempo para
+    ubicarlo por bisección. Un nuevo récord personal es quitar e insertar
+    en la lista ordenada, sin recorrer ni reordenar toda la pista.
+    """
+
+    PASSED_USERS_LIMIT = 10 # Máximo de usuarios superados que se devuelven por envío
+
+    def __init__(self, entries=()):
+        self._entries = {} # user_id -> mejor entrada del usuario
+        for entry in entries:
+            current = self._entries.get(entry.user_id)
+            if current is None or entry.time_ms < current.time_ms:
+                self._entries[entry.user_id] = entry
+        self._times = {user_id: entry.time_ms for user_id, entry in self._entries.items()}
+        self._keys = sorted((time_ms, user_id) for user_id, time_ms in self._times.items())
+
+    def __len__(self):
+        return len(self._keys)
+
+    def entry_of(self, user_id):
+        return self._entries.get(user_id)
+
+    def rank_of(self, user_id):
+        """Posición (desde 1) del usuario en la pista, o None si no tiene tiempo."""
+        time_ms = self._times.get(user_id)
+        if time_ms is None:
+            return None
+        return bisect.bisect_left(self._keys, (time_ms, user_id)) + 1
+
+    def submit(self, entry):
+        """
+        Registra la entrada si mejora el tiempo del usuario y devuelve un RankChange
+        (puesto anterior, puesto nuevo y a quiénes superó), o None si no es mejor.
+        """
+        user_id = entry.user_id
+        time_ms = entry.time_ms
+        old_time_ms = self._times.get(user_id)
+        if old_time_ms is not None and time_ms >= old_time_ms:
+            return None
+
+        if old_time_ms is not None:
+            old_pos = bisect.bisect_left(self._keys, (old_time_ms, user_id))
+            del self._keys[old_pos]
+        else:
+            old_pos = len(self._keys) # Un usuario nuevo "entra" desde el final
+        new_pos = bisect.bisect_left(self._keys, (time_ms, user_id))
+        self._keys.insert(new_pos, (time_ms, user_id))
+        self._times[user_id] = time_ms
+        self._entries[user_id] = entry
+
+        # Los superados son los que ahora quedan justo detrás, hasta su posición anterior
+        passed_count = old_pos - new_pos
+        passed_user_ids = [passed_id for _, passed_id in self._keys[new_pos + 1:new_pos + 1 + min(passed_count, self.PASSED_USERS_LIMIT)]]
+        return RankChange(
+            old_rank=old_pos + 1 if old_time_ms is not None else None,
+            new_rank=new_pos + 1,
+            passed_count=passed_count,
+            passed_user_ids=passed_user_ids,
+        )
+
+    def user_ids(self):
+        return self._times.keys()
+
+    def page(self, start, stop):
+        """Entradas de las posiciones [start, stop) (desde 0), de mejor a peor tiempo."""
+        return [self._entries[user_id] for _, user_id in self._keys[start:stop]]
+
+    def top(self, n):
+        return self.page(0, n)
+
+    def iter_entries(self):
+        """Recorre las entradas de mejor a peor tiempo sin copiar la lista."""
+        for _, user_id in self._keys:
+            yield self._entries[user_id]
+
+    def iter_times_ms(self):
+        """Recorre los tiempos en ms de mejor a peor."""
+        for time_ms, _ in self._keys:
+            yield time_ms
+
+
+# Obtener el ranking en memoria de una pista (se construye la primera vez que se usa).
+# Una clave sin tiempos en el guild (p. ej. un nombre cualquiera escrito por el usuario)
+# devuelve un ranking vacío sin guardarlo, para no llenar la caché del guild.
+def get_track_ranking(guild_id, guild_data, storage_key):
+    if not isinstance(guild_data.get(storage_key), list):
+        return TrackRanking()
+    rankings = guild_store.derived(guild_id).setdefault('rankings', {})
+    ranking = rankings.get(storage_key)
+    if ranking is None:
+        ranking = rankings[storage_key] = TrackRanking(guild_data.get(storage_key, []))
+    return ranking
+
+# Claves de guild_data que no son pistas: comparten el diccionario con las claves de pista,
+# así que ningún nombre de pista enviado puede usarlas
+GUILD_META_KEYS = frozenset({'language', 'journal_seq', 'medals', 'schema', 'quarantine'})
+
+def is_track_key(storage_key):
+    return bool(storage_key) and storage_key not in GUILD_META_KEYS
+
+def record_time(guild_id, guild_data, storage_key, user_id, user_name, time_str, time_ms, url_evidence):
+    """
+    Aplica un tiempo enviado a los datos del guild y a su ranking.
+    Devuelve (resultado, entrada, cambio) donde resultado es 'registered',
+    'updated' o 'not_better'; en este último caso la entrada es el récord actual.
+    La clave debe haberse validado con is_track_key.
+    """
+    if not is_track_key(storage_key) or not isinstance(guild_data.get(storage_key, []), list):
+        raise ValueError(f"Clave de pista no válida: {storage_key!r}")
+    guild_data.setdefault(storage_key, []) # Pista nueva: crearla antes para que su ranking quede en caché
+    ranking = get_track_ranking(guild_id, guild_data, storage_key)
+    existing = ranking.entry_of(user_id)
+    if existing is not None and time_ms >= existing.time_ms:
+        return 'not_better', existing, None
+
+    if existing is not None:
+        # Actualizar la entrada en su sitio: la lista de la pista no necesita reordenarse
+        existing.set_time(user_name, time_ms, time_str, url_evidence)
+        entry = existing
+    else:
+        entry = TimeEntry(user_id, user_name, time_ms, time_str, url_evidence)
+        guild_data.setdefault(storage_key, []).append(entry)
+
+    change = ranking.submit(entry)
+    if change is not None:
+        # El array de tiempos de /tt-stats se reconstruye en la próxima consulta
+        guild_store.derived(guild_id).get('time_arrays', {}).pop(storage_key, None)
+    if existing is None and user_id.isdigit():
+        ranked_members = guild_store.derived(guild_id).get('ranked_members', {}).get(storage_key)
+        member_index = member_indexes.get(int(guild_id))
+        if ranked_members is not None and member_index is not None and int(user_id) in member_index:
+            ranked_members.add(int(user_id), member_index)
+    user_index = guild_store.derived(guild_id).get('user_index')
+    if user_index is not None:
+        user_index.setdefault(user_id, {})[storage_key] = entry
+    if change is not None and change.new_rank <= len(MEDAL_PLACES):
+        update_medal_view(guild_id, guild_data, storage_key)
+    return ('updated' if existing is not None else 'registered'), entry, change
+
+# Obtener los tiempos en ms de una pista como array de NumPy ordenado de mejor a peor.
+# Se guarda mientras el guild esté en caché; record_time lo descarta cuando la pista cambia.
+def get_track_times_array(guild_id, guild_data, storage_key):
+    if not isinstance(guild_data.get(storage_key), list):
+        return np.empty(0, dtype=np.int64) # Pista sin tiempos: no se guarda nada en caché
+    time_arrays = guild_store.derived(guild_id).setdefault('time_arrays', {})
+    times = time_arrays.get(storage_key)
+    if times is None:
+        ranking = get_track_ranking(guild_id, guild_data, storage_key)
+        times = time_arrays[storage_key] = np.fromiter(ranking.iter_times_ms(), dtype=np.int64, count=len(ranking))
+    return times
+
+# --- ÍNDICE INVERSO POR USUARIO ---
+# Obtener el índice user_id -> {clave de pista: mejor entrada} del guild (se construye una vez por carga
+# y record_time lo mantiene al día), para que las consultas de un usuario no recorran todo el guild.
+def get_user_index(guild_id, guild_data):
+    derived = guild_store.derived(guild_id)
+    user_index = derived.get('user_index')
+    if user_index is None:
+        user_index = {}
+        for storage_key, entries in guild_data.items():
+            if not isinstance(entries, list):
+                continue
+            for entry in entries:
+                user_index.setdefault(entry.user_id, {})[storage_key] = entry
+        derived['user_index'] = user_index
+    return user_index
+
+# --- MEDALLERO MATERIALIZADO POR GUILD ---
+# guild_data['medals'] guarda el podio de cada pista y el recuento de medallas por usuario.
+# Se actualiza solo para la pista que cambia en cada /tt y se guarda junto a los datos del guild.
+MEDAL_PLACES = ('1st', '2nd', '3rd')
+MEDAL_EMOJIS = ("🥇", "🥈", "🥉")
+
+def _apply_podium(medals, storage_key, top_entries):
+    """Reemplaza el podio de una pista ajustando los recuentos de medallas de quienes entran y salen."""
+    tallies = medals['tallies']
+    for place, (user_id, _) in zip(MEDAL_PLACES, medals['podiums'].get(storage_key, [])):
+        tally = tallies.get(user_id)
+        if tally is None:
+            continue
+        tally[place] -= 1
+        if not any(tally[p] for p in MEDAL_PLACES):
+            del tallies[user_id]
+
+    for place, entry in zip(MEDAL_PLACES, top_entries):
+        tally = tallies.setdefault(entry.user_id, {'1st': 0, '2nd': 0, '3rd': 0, 'display_name': entry.user_name})
+        tally['display_name'] = entry.user_name
+        tally[place] += 1
+
+    if top_entries:
+        medals['podiums'][storage_key] = [[entry.user_id, entry.time] for entry in top_entries]
+    else:
+        medals['podiums'].pop(storage_key, None)
+
+def has_medal_view(guild_data):
+    medals = guild_data.get('medals')
+    return isinstance(medals, dict) and 'podiums' in medals and 'tallies' in medals
+
+def rebuild_medal_view(guild_id, guild_data):
+    """
+    Recalcula el medallero completo. GuildStore lo hace al cargar datos guardados sin
+    medallero (o con uno desfasado) y lo persiste con la próxima escritura; aquí no se guarda.
+    """
+    medals = {'podiums': {}, 'tallies': {}}
+    track_keys = [key for key, entries in guild_data.items() if isinstance(entries, list)]
+    for storage_key in sorted(track_keys):
+        _apply_podium(medals, storage_key, get_track_ranking(guild_id, guild_data, storage_key).top(len(MEDAL_PLACES)))
+    guild_data['medals'] = medals
+    guild_store.derived(guild_id).pop('leaderboard', None)
+    return medals
+
+def get_medal_view(guild_id, guild_data):
+    if not has_medal_view(guild_data):
+        return rebuild_medal_view(guild_id, guild_data) # Solo datos que no pasaron por la carga
+    return guild_data['medals']
+
+def update_medal_view(guild_id, guild_data, storage_key):
+    """Actualiza el medallero tras un cambio en el podio de una pista."""
+    if not has_medal_view(guild_data):
+        rebuild_medal_view(guild_id, guild_data) # Ya incluye el cambio
+        return
+    medals = guild_data['medals']
+    ranking = get_track_ranking(guild_id, guild_data, storage_key)
+    _apply_podium(medals, storage_key, ranking.top(len(MEDAL_PLACES)))
+    guild_store.derived(guild_id).pop('leaderboard', None)
+
+def get_medal_leaderboard(guild_id, guild_data):
+    """Lista (user_id, recuento) ordenada por 1er > 2do > 3er lugar; se guarda hasta el próximo cambio de podio."""
+    derived = guild_store.derived(guild_id)
+    leaderboard = derived.get('leaderboard')
+    if leaderboard is None:
+        tallies = get_medal_view(guild_id, guild_data)['tallies']
+        leaderboard = sorted(tallies.items(), key=lambda item: (item[1]['1st'], item[1]['2nd'], item[1]['3rd']), reverse=True)
+        derived['leaderboard'] = leaderboard
+    return leaderboard
+
+# --- ÍNDICE DE BÚSQUEDA DE PISTAS (para autocompletado) ---
+class TrackSearchIndex:
+    """
+    Índice de nombres de pistas construido una sola vez al iniciar el bot.
+    Guarda los nombres de visualización y los alias de STORAGE_KEY_MAP ya
+    normalizados (unidecode + minúsculas) y ordenados, para resolver
+    búsquedas por prefijo (bisect) y por subcadena sin recalcular nada.
+    """
+
+    MAX_RESULTS = 25 # Límite de sugerencias de Discord
+
+    def __init__(self, langs):
+        # Un Choice por pista; el valor es la clave canónica para que normalize_track_name la resuelva siempre
+        self._choices = {}
+        terms = set()
+        for storage_key, names_by_lang in TRACK_DISPLAY_NAMES.items():
+            for lang in langs:
+                display_name = names_by_lang.get(lang, names_by_lang.get('es'))
+                self._choices.setdefault(storage_key, app_commands.Choice(name=display_name, value=storage_key))
+                terms.add((unidecode(display_name).lower(), storage_key))
+        for alias, storage_key in STORAGE_KEY_MAP.items():
+            if storage_key in self._choices:
+                terms.add((unidecode(alias).lower(), storage_key))
+
+        self._entries = sorted(terms)
+        self._terms = [term for term, _ in self._entries]
+        self._all_choices = sorted(self._choices.values(), key=lambda choice: unidecode(choice.name).lower())[:self.MAX_RESULTS]
+
+    def search(self, current):
+        query = unidecode(current).lower().strip()
+        if not query:
+            return self._all_choices
+
+        seen = set()
+        results = []
+
+        def add(storage_key):
+            if storage_key not in seen:
+                seen.add(storage_key)
+                results.append(self._choices[storage_key])
+
+        # Primero las coincidencias por prefijo: son un rango contiguo en la lista ordenada
+        i = bisect.bisect_left(self._terms, query)
+        while i < len(self._terms) and self._terms[i].startswith(query):
+            add(self._entries[i][1])
+            i += 1
+        # Luego las coincidencias en cualquier parte del nombre
+        for term, storage_key in self._entries:
+            if len(results) >= self.MAX_RESULTS:
+                break
+            if query in term:
+                add(storage_key)
+        return results[:self.MAX_RESULTS]
+
+
+TRACK_SEARCH_INDEXES = {lang: TrackSearchIndex([lang]) for lang in LANG_DATA}
+TRACK_SEARCH_INDEXES['all'] = TrackSearchIndex(list(LANG_DATA))
+
 # --- FUNCIÓN DE AUTOCOMPLETADO PARA NOMBRES DE PISTAS ---
+@timed_autocomplete
 async def track_name_autocomplete(interaction: discord.Interaction, current: str):
     """
-    Proporciona sugerencias de autocompletado para nombres de pistas.
-    Las sugerencias se basan en los valores (nombres de visualización) de TRACK_ALIASES.
+    Proporciona sugerencias de autocompletado para nombres de pistas
+    usando el índice precalculado del idioma del servidor. Si aún no se
+    conoce el idioma del servidor se busca en todos los idiomas, sin leer disco.
     """
-    suggestions = []
-    current_lower = unidecode(current).lower() 
-
-    # Obtener el idioma del servidor para las sugerencias
     guild_id = str(interaction.guild.id) if interaction.guild else None
-    lang = load_guild_data(guild_id).get('language', 'es') if guild_id else 'es'
+    lang = guild_store.language(guild_id, default=None) if guild_id else None
+    return TRACK_SEARCH_INDEXES.get(lang, TRACK_SEARCH_INDEXES['all']).search(current)
 
-    # Iterar sobre los NOMBRES DE VISUALIZACIÓN (valores) de TRACK_ALIASES
-    unique_display_names = sorted(list(set(track_data.get(lang, track_data.get('es')) for track_data in TRACK_DISPLAY_NAMES.values())))
+# --- ÍNDICE DE MIEMBROS POR GUILD (para autocompletado y búsqueda por nombre) ---
+class MemberSearchIndex:
+    """
+    Índice de nombres de los miembros (no bots) de un guild. Se construye una
+    vez y se mantiene al día con los eventos de miembros, para no recorrer
+    guild.members en cada pulsación de tecla. Los nombres se normalizan como
+    los de las pistas (unidecode + minúsculas), así "jose" encuentra a "José".
+    Las búsquedas de 3 o más caracteres intersectan trigramas; las de 1 o 2
+    (las primeras pulsaciones) se resuelven con un índice de letras y
+    bigramas, que ya es exactamente el conjunto de nombres que las contienen.
+    """
 
-    for display_name in unique_display_names:
-        normalized_display_name = unidecode(display_name).lower()
-        if current_lower in normalized_display_name:
-            suggestions.append(app_commands.Choice(name=display_name, value=display_name))
-        
-        if len(suggestions) >= 25: 
-            break
-    return suggestions
+    NGRAM_SIZE = 3
+
+    def __init__(self):
+        self._members = {}                 # member_id -> (display_name, textos normalizados buscables)
+        self._by_display_name = {}         # display_name -> set de member_ids
+        self._ngrams = defaultdict(set)    # trigrama -> set de member_ids
+        self._short_grams = defaultdict(set) # letra o bigrama -> set de member_ids
+        self.version = 0                   # cambia con cada alta/baja/modificación
+        self._sorted = []
+        self._sorted_positions = {}        # member_id -> posición en _sorted
+        self._sorted_version = -1
+
+    @staticmethod
+    def _normalize(text):
+        return unidecode(text).lower()
+
+    @staticmethod
+    def _grams_of(text, size):
+        return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+    @classmethod
+    def _ngrams_of(cls, text):
+        return cls._grams_of(text, cls.NGRAM_SIZE)
+
+    @classmethod
+    def _short_grams_of(cls, text):
+        grams = set()
+        for size in range(1, cls.NGRAM_SIZE):
+            grams |= cls._grams_of(text, size)
+        return grams
+
+    def add(self, member):
+        if member.bot:
+            return
+        self.remove(member.id)
+        searchable = {self._normalize(member.display_name)}
+        if member.name:
+            searchable.add(self._normalize(member.name))
+        self._members[member.id] = (member.display_name, tuple(searchable))
+        self._by_display_name.setdefault(member.display_name, set()).add(member.id)
+        for text in searchable:
+            for gram in self._ngrams_of(text):
+                self._ngrams[gram].add(member.id)
+            for gram in self._short_grams_of(text):
+                self._short_grams[gram].add(member.id)
+        self.version += 1
+
+    @staticmethod
+    def _discard(index, gram, member_id):
+        ids = index.get(gram)
+        if ids is not None:
+            ids.discard(member_id)
+            if not ids:
+                del index[gram]
+
+    def remove(self, member_id):
+        indexed = self._members.pop(member_id, None)
+        if indexed is None:
+            return
+        display_name, searchable = indexed
+        ids = self._by_display_name.get(display_name)
+        if ids is not None:
+            ids.discard(member_id)
+            if not ids:
+                del self._by_display_name[display_name]
+        for text in searchable:
+            for gram in self._ngrams_of(text):
+                self._discard(self._ngrams, gram, member_id)
+            for gram in self._short_grams_of(text):
+                self._discard(self._short_grams, gram, member_id)
+        self.version += 1
+
+    def __len__(self):
+        return len(self._members)
+
+    def __contains__(self, member_id):
+        return member_id in self._members
+
+    def display_name_of(self, member_id):
+        indexed = self._members.get(member_id)
+        return indexed[0] if indexed else None
+
+    def sorted_members(self):
+        """Pares (display_name, member_id) en orden alfabético; se recalcula solo si el índice cambió."""
+        if self._sorted_version != self.version:
+            self._sorted = sorted(((display_name, member_id) for member_id, (display_name, _) in self._members.items()), key=lambda item: item[0].lower())
+            self._sorted_positions = {member_id: position for position, (_, member_id) in enumerate(self._sorted)}
+            self._sorted_version = self.version
+        return self._sorted
+
+    def position_of(self, member_id):
+        """Posición del miembro en sorted_members()."""
+        self.sorted_members()
+        return self._sorted_positions[member_id]
+
+    def find_by_display_name(self, display_name):
+        """Devuelve el id de un miembro con ese nombre exacto de visualización, o None."""
+        ids = self._by_display_name.get(display_name)
+        return next(iter(ids)) if ids else None
+
+    def search(self, query, limit=25):
+        """Devuelve hasta `limit` pares (display_name, member_id) cuyo nombre contiene `query`."""
+        query = self._normalize(query)
+        if not query:
+            candidates = self._members
+        elif len(query) < self.NGRAM_SIZE:
+            # Exacto: el conjunto ya son los miembros cuyo nombre contiene la letra o el bigrama
+            candidates = self._short_grams.get(query, ())
+        else:
+            candidate_sets = []
+            for gram in self._ngrams_of(query):
+                ids = self._ngrams.get(gram)
+                if not ids:
+                    return []
+                candidate_sets.append(ids)
+            candidate_sets.sort(key=len)
+            candidates = candidate_sets[0].intersection(*candidate_sets[1:])
+
+        results = []
+        for member_id in candidates:
+            display_name, searchable = self._members[member_id]
+            # Los trigramas solo preseleccionan; confirmar que la subcadena completa aparece
+            if any(query in text for text in searchable):
+                results.append((display_name, member_id))
+                if len(results) >= limit:
+                    break
+        results.sort(key=lambda item: item[0].lower())
+        return results
+
+    @classmethod
+    def from_guild(cls, guild):
+        index = cls()
+        for member in guild.members:
+            index.add(member)
+        return index
+
+
+member_indexes = {} # guild_id -> MemberSearchIndex
+
+def get_member_index(guild):
+    """Devuelve el índice de miembros del guild, construyéndolo si aún no existe."""
+    index = member_indexes.get(guild.id)
+    if index is None:
+        index = member_indexes[guild.id] = MemberSearchIndex.from_guild(guild)
+    return index
+
+def find_member(guild, username):
+    """Busca un miembro por ID (valor del autocompletado) o por nombre exacto de visualización."""
+    if username.isdigit():
+        return guild.get_member(int(username))
+    member_id = get_member_index(guild).find_by_display_name(username)
+    return guild.get_member(member_id) if member_id is not None else None
+
+# --- MIEMBROS CON TIEMPO POR PISTA (para /tt-show) ---
+class RankedMembers:
+    """
+    Miembros del guild que tienen tiempo en una pista. record_time y los eventos
+    de alta y baja de miembros lo mantienen, así /tt-show cuenta los miembros sin
+    tiempo sin recorrer el ranking. Guarda además sus posiciones dentro de
+    member_index.sorted_members() para ir directamente a la k-ésima fila sin
+    tiempo; esas posiciones solo se recalculan si cambia el índice de miembros.
+    """
+
+    def __init__(self, ranking, member_index):
+        self.member_ids = {int(user_id) for user_id in ranking.user_ids() if user_id.isdigit() and int(user_id) in member_index}
+        self._positions = None # Posiciones ordenadas en sorted_members(), o None si hay que recalcularlas
+        self._positions_key = None
+
+    def __len__(self):
+        return len(self.member_ids)
+
+    def add(self, member_id, member_index):
+        if member_id in self.member_ids:
+            return
+        self.member_ids.add(member_id)
+        if self._positions is not None and self._positions_key == (id(member_index), member_index.version):
+            bisect.insort(self._positions, member_index.position_of(member_id))
+
+    def discard(self, member_id):
+        if member_id in self.member_ids:
+            self.member_ids.discard(member_id)
+            self._positions = None
+
+    def _sorted_positions(self, member_index):
+        key = (id(member_index), member_index.version)
+        if self._positions is None or self._positions_key != key:
+            self._positions = sorted(member_index.position_of(member_id) for member_id in self.member_ids if member_id in member_index)
+            self._positions_key = key
+        return self._positions
+
+    def unranked_members(self, member_index, start, stop):
+        """Pares (display_name, member_id) de los miembros sin tiempo en las posiciones [start, stop), en orden alfabético."""
+        members = member_index.sorted_members()
+        positions = self._sorted_positions(member_index)
+        # Primera posición p del orden alfabético con start + 1 miembros sin tiempo en [0, p]
+        low, high = 0, len(members)
+        while low < high:
+            middle = (low + high) // 2
+            if middle + 1 - bisect.bisect_right(positions, middle) > start:
+                high = middle
+            else:
+                low = middle + 1
+        results = []
+        next_ranked = bisect.bisect_left(positions, low)
+        position = low
+        while position < len(members) and len(results) < stop - start:
+            if next_ranked < len(positions) and positions[next_ranked] == position:
+                next_ranked += 1
+            else:
+                results.append(members[position])
+            position += 1
+        return results
+
+def get_ranked_members(guild_id, guild_data, storage_key, member_index):
+    """RankedMembers de una pista; como los rankings, no se guarda para pistas que el guild no tiene."""
+    ranking = get_track_ranking(guild_id, guild_data, storage_key)
+    if not isinstance(guild_data.get(storage_key), list):
+        return RankedMembers(ranking, member_index)
+    ranked_members_by_track = guild_store.derived(guild_id).setdefault('ranked_members', {})
+    ranked_members = ranked_members_by_track.get(storage_key)
+    if ranked_members is None:
+        ranked_members = ranked_members_by_track[storage_key] = RankedMembers(ranking, member_index)
+    return ranked_members
+
+def update_ranked_members(guild_id, member_id, present):
+    """Refleja el alta (present=True) o la baja de un miembro en los RankedMembers ya construidos del guild."""
+    derived = guild_store.derived(guild_id, create=False)
+    if not derived or 'ranked_members' not in derived:
+        return
+    member_index = member_indexes.get(int(guild_id))
+    for storage_key, ranked_members in derived['ranked_members'].items():
+        if not present:
+            ranked_members.discard(member_id)
+            continue
+        ranking = derived.get('rankings', {}).get(storage_key)
+        if member_index is not None and member_id in member_index and ranking is not None and ranking.entry_of(str(member_id)) is not None:
+            ranked_members.add(member_id, member_index)
 
 # --- FUNCIÓN DE AUTOCOMPLETADO PARA NOMBRES DE USUARIO ---
+@timed_autocomplete
 async def username_autocomplete(interaction: discord.Interaction, current: str):
     """
     Proporciona sugerencias de autocompletado para nombres de usuario del servidor.
     """
-    suggestions = []
     if not interaction.guild:
-        return suggestions 
+        return []
+
+    return [
+        app_commands.Choice(name=display_name, value=str(member_id))
+        for display_name, member_id in get_member_index(interaction.guild).search(current)
+    ]
 
-    current_lower = current.lower()
-    
-    for member in interaction.guild.members:
-        if member.bot: 
-            continue
-        
-        if current_lower in member.display_name.lower() or \
-           (member.name and current_lower in member.name.lower()):
-            
-            suggestions.append(app_commands.Choice(name=member.display_name, value=str(member.id)))
-        
-        if len(suggestions) >= 25: 
-            break
-    return suggestions
+
+# --- SINCRONIZACIÓN DE COMANDOS SOLO CUANDO CAMBIAN ---
+# Firma (SHA-256) de la última definición de comandos sincronizada con Discord
+COMMAND_TREE_HASH_PATH = os.path.join(DATA_DIR, 'command_tree.sha256')
+
+def command_tree_hash():
+    """Firma de los comandos registrados y de los textos de LANG_DATA de los que salen sus traducciones."""
+    payload = {
+        'commands': sorted((command.to_dict(bot.tree) for command in bot.tree.get_commands()), key=lambda c: c['name']),
+        'lang_data': LANG_DATA,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+async def sync_command_tree(force=False):
+    """
+    Sincroniza los comandos de barra con Discord solo si su firma cambió desde
+    la última sincronización (o si force=True). Devuelve True si sincronizó.
+    """
+    tree_hash = command_tree_hash()
+    if not force and os.path.exists(COMMAND_TREE_HASH_PATH):
+        with open(COMMAND_TREE_HASH_PATH, 'r') as f:
+            if f.read().strip() == tree_hash:
+                return False
+    await bot.tree.sync()
+    tmp_path = f"{COMMAND_TREE_HASH_PATH}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(tree_hash)
+    os.replace(tmp_path, COMMAND_TREE_HASH_PATH)
+    return True
 
 
 # --- Eventos del Bot ---
 
+@bot.event
+async def setup_hook():
+    """Se ejecuta una vez antes de conectar: instala el traductor de los textos de los comandos."""
+    await bot.tree.set_translator(LangDataTranslator())
+
 @bot.event
 async def on_ready():
     """Se ejecuta cuando el bot se conecta a Discord."""
     print(get_localized_string(None, "bot_connected", bot_user=bot.user)) # No guild_id yet
     print(get_localized_string(None, "bot_id", bot_id=bot.user.id))
     await bot.change_presence(activity=discord.Game(name=get_localized_string(None, "bot_status_activity")))
-
+    guild_store.start()
+    if METRICS_PORT:
+        try:
+            await metrics.start_server()
+        except OSError as e:
+            print(f"No se pudo iniciar el endpoint de métricas en {METRICS_HOST}:{METRICS_PORT}: {e}")
+
+    # Construir (o reconstruir tras una reconexión) los índices de miembros de todos los servidores
+    for guild in bot.guilds:
+        member_indexes[guild.id] = MemberSearchIndex.from_guild(guild)
+
+    # Las reconexiones no vuelven a sincronizar si los comandos no cambiaron
     try:
-        await bot.tree.sync()
-        print(get_localized_string(None, "commands_synced_on_ready"))
+        if await sync_command_tree():
+            print(get_localized_string(None, "commands_synced_on_ready"))
+        else:
+            print(get_localized_string(None, "commands_sync_skipped"))
     except Exception as e:
         print(get_localized_string(None, "error_sync_on_ready", error=e))
 
+@bot.event
+async def on_guild_join(guild):
+    member_indexes[guild.id] = MemberSearchIndex.from_guild(guild)
+    (guild_store.derived(guild.id, create=False) or {}).pop('ranked_members', None) # Miembros nuevos: recalcular
+
+@bot.event
+async def on_guild_remove(guild):
+    member_indexes.pop(guild.id, None)
+    (guild_store.derived(guild.id, create=False) or {}).pop('ranked_members', None)
+
+@bot.event
+async def on_member_join(member):
+    index = member_indexes.get(member.guild.id)
+    if index is not None:
+        index.add(member)
+        update_ranked_members(member.guild.id, member.id, present=True)
+
+@bot.event
+async def on_member_update(before, after):
+    index = member_indexes.get(after.guild.id)
+    if index is not None and (before.display_name != after.display_name or before.name != after.name):
+        index.add(after)
+
+@bot.event
+async def on_user_update(before, after):
+    """Los cambios de nombre global no llegan por on_member_update: actualizar cada guild en común."""
+    if before.name == after.name and before.display_name == after.display_name:
+        return
+    for guild in after.mutual_guilds:
+        index = member_indexes.get(guild.id)
+        member = guild.get_member(after.id)
+        if index is not None and member is not None:
+            index.add(member)
+
+@bot.event
+async def on_member_remove(member):
+    index = member_indexes.get(member.guild.id)
+    if index is not None:
+        index.remove(member.id)
+    update_ranked_members(member.guild.id, member.id, present=False)
+
+@bot.event
+async def on_app_command_completion(interaction, command):
+    record_command_latency(interaction, command, 'ok')
+
 @bot.event
 async def on_command_error(ctx, error):
     """Maneja errores en los comandos de texto (si se usara alguno)."""
@@ -411,168 +2135,210 @@ async def on_command_error(ctx, error):
 
 # --- Comandos de Barra (Slash Commands) ---
 
-@bot.tree.command(name="tt", description=LANG_DATA['es']['command_tt_desc']) # Default ES for command desc
+@bot.tree.command(name="tt", description=command_text('command_tt_desc')) # Default ES for command desc
 @app_commands.autocomplete(track_name=track_name_autocomplete) 
 @discord.app_commands.describe(
-    track_name=LANG_DATA['es']['command_tt_track_name_desc'],
-    time_str=LANG_DATA['es']['command_tt_time_str_desc'],
-    url_evidence=LANG_DATA['es']['command_tt_url_evidence_desc']
+    track_name=command_text('command_tt_track_name_desc'),
+    time_str=command_text('command_tt_time_str_desc'),
+    url_evidence=command_text('command_tt_url_evidence_desc'),
+    mention_passed=command_text('command_tt_mention_passed_desc')
 )
-async def register_time_slash(interaction: discord.Interaction, track_name: str, time_str: str, url_evidence: str = None):
+async def register_time_slash(interaction: discord.Interaction, track_name: str, time_str: str, url_evidence: str = None, mention_passed: bool = False):
     guild_id = str(interaction.guild.id) if interaction.guild else None
     if not guild_id:
         await interaction.response.send_message(get_localized_string(None, "response_guild_only"), ephemeral=True)
         return
-    
-    current_guild_data = load_guild_data(guild_id)
-    lang = current_guild_data.get('language', 'es')
 
     # Obtener la clave de almacenamiento normalizada
     storage_track_key = normalize_track_name(track_name) 
-    # Obtener el nombre para mostrar
-    display_track_name = get_display_track_name(storage_track_key, lang)
     
-    # Validar formato del tiempo
-    match = TIME_REGEX.match(time_str)
-    if not match:
-        await interaction.response.send_message(get_localized_string(guild_id, "response_time_format_error"), ephemeral=True)
+    # Validar formato del tiempo y la URL si se proporciona
+    error_key = None
+    if not is_track_key(storage_track_key):
+        error_key = "response_track_invalid"
+    elif not TIME_REGEX.match(time_str):
+        error_key = "response_time_format_error"
+    elif url_evidence and not is_valid_url(url_evidence):
+        error_key = "response_url_invalid"
+    if error_key is not None:
+        # Responder a tiempo aunque haya que leer el guild para conocer su idioma
+        await interaction.response.defer(ephemeral=True)
+        tr = await load_localizer(guild_id)
+        await interaction.followup.send(tr(error_key, track_name=track_name))
         return
 
-    # Validar URL si se proporciona
-    if url_evidence:
-        if not is_valid_url(url_evidence):
-            await interaction.response.send_message(get_localized_string(guild_id, "response_url_invalid"), ephemeral=True)
-            return
-
+    # Esperar el lock y el guardado puede superar los 3 s que da Discord para responder
+    await interaction.response.defer()
     total_ms = time_to_ms(time_str)
 
     user_id = str(interaction.user.id)
     user_name = interaction.user.display_name
 
-    # Usar storage_track_key para almacenar y acceder a los datos
-    if storage_track_key not in current_guild_data:
-        current_guild_data[storage_track_key] = []
-
-    found_existing = False
-    for i, entry in enumerate(current_guild_data[storage_track_key]):
-        if entry["user_id"] == user_id:
-            existing_time_ms = time_to_ms(entry["time"])
-            
-            if total_ms < existing_time_ms:
-                current_guild_data[storage_track_key][i] = {
-                    "user_id": user_id,
-                    "user_name": user_name,
-                    "time": time_str,
-                    "url_evidence": url_evidence
-                }
-                evidence_text = get_localized_string(guild_id, "evidence_prefix", url_evidence=url_evidence) if url_evidence else ""
-                await interaction.response.send_message(get_localized_string(guild_id, "response_time_updated", user_name=user_name, track_name=display_track_name, time_str=time_str, evidence_text=evidence_text))
-            else:
-                await interaction.response.send_message(get_localized_string(guild_id, "response_time_not_better", time_str=time_str, track_name=display_track_name, entry_time=entry['time']))
-            found_existing = True
-            break
-    
-    if not found_existing:
-        current_guild_data[storage_track_key].append({
-            "user_id": user_id,
-            "user_name": user_name,
-            "time": time_str,
-            "url_evidence": url_evidence
-        })
-        evidence_text = get_localized_string(guild_id, "evidence_prefix", url_evidence=url_evidence) if url_evidence else ""
-        await interaction.response.send_message(get_localized_string(guild_id, "response_time_registered", user_name=user_name, track_name=display_track_name, time_str=time_str, evidence_text=evidence_text))
+    # Leer, modificar y guardar bajo el lock del guild: dos envíos simultáneos no se pisan.
+    # La respuesta se envía después de soltarlo para no retener a los demás envíos del guild.
+    async with guild_store.lock(guild_id):
+        current_guild_data = await load_guild_data(guild_id)
+        tr = get_localizer(guild_id) # Con el guild ya cargado, su idioma es el correcto
+        # Usar storage_track_key para almacenar y acceder a los datos
+        result, entry, change = record_time(guild_id, current_guild_data, storage_track_key, user_id, user_name, time_str, total_ms, url_evidence)
+        record_time_str = entry.time
+        # Obtener el nombre para mostrar
+        display_track_name = get_display_track_name(storage_track_key, guild_store.language(guild_id))
+        rank_lines = []
+        if change is not None:
+            # Se arma dentro del lock para que el total y los superados correspondan a este envío
+            ranking = get_track_ranking(guild_id, current_guild_data, storage_track_key)
+            rank_lines = rank_change_lines(tr, interaction.guild, ranking, change, user_name, display_track_name, mention_passed)
+        if result != 'not_better':
+            await save_time_entry(guild_id, current_guild_data, storage_track_key, entry)
+
+    if result == 'not_better':
+        await interaction.followup.send(tr("response_time_not_better", time_str=time_str, track_name=display_track_name, entry_time=record_time_str))
+        return
 
-    current_guild_data[storage_track_key].sort(key=lambda x: time_to_ms(x["time"]))
-    
-    save_guild_data(guild_id, current_guild_data) 
+    evidence_text = tr("evidence_prefix", url_evidence=url_evidence) if url_evidence else ""
+    response_key = "response_time_updated" if result == 'updated' else "response_time_registered"
+    lines = [tr(response_key, user_name=user_name, track_name=display_track_name, time_str=time_str, evidence_text=evidence_text)]
+    lines.extend(rank_lines)
+    # Solo se notifica a los superados si se pidió mention_passed; los nombres nunca mencionan a nadie
+    allowed_mentions = discord.AllowedMentions(everyone=False, roles=False, users=True) if mention_passed else discord.AllowedMentions.none()
+    await interaction.followup.send("\n".join(lines), allowed_mentions=allowed_mentions)
 
 
-@bot.tree.command(name="tt-show", description=LANG_DATA['es']['command_ttshow_desc'])
-@app_commands.autocomplete(track_name=track_name_autocomplete) 
-@discord.app_commands.describe(
-    track_name=LANG_DATA['es']['command_ttshow_track_name_desc'],
-    link=LANG_DATA['es']['command_ttshow_link_desc']
-)
-async def show_times(interaction: discord.Interaction, track_name: str, link: bool = False):
-    await interaction.response.defer() 
+def rank_change_lines(tr, guild, ranking, change, user_name, display_track_name, mention_passed):
+    """
+    Líneas extra de la respuesta de /tt a partir del RankChange del envío:
+    puesto alcanzado, a quiénes superó y cambios de medalla. Todo sale de los
+    puestos anterior y nuevo (bisección en el ranking), sin recorrer la pista.
+    """
+    member_index = get_member_index(guild)
+
+    def passed_label(passed_id):
+        if mention_passed and passed_id.isdigit():
+            return f"<@{passed_id}>"
+        member_name = member_index.display_name_of(int(passed_id)) if passed_id.isdigit() else None
+        return member_name or ranking.entry_of(passed_id).user_name or passed_id
+
+    total = len(ranking)
+    if change.old_rank is None:
+        lines = [tr("tt_rank_reached", rank=change.new_rank, total=total)]
+    elif change.old_rank != change.new_rank:
+        lines = [tr("tt_rank_improved", old_rank=change.old_rank, rank=change.new_rank, total=total)]
+    else:
+        lines = [tr("tt_rank_kept", rank=change.new_rank, total=total)]
+
+    passed_labels = [passed_label(passed_id) for passed_id in change.passed_user_ids]
+    if passed_labels:
+        names = ", ".join(passed_labels)
+        hidden_count = change.passed_count - len(passed_labels)
+        if hidden_count > 0:
+            names = tr("tt_passed_more", names=names, count=hidden_count)
+        lines.append(tr("tt_passed", names=names))
+
+    # Medallas: solo cambian si el envío entra o sube dentro del podio
+    if change.new_rank <= len(MEDAL_PLACES) and change.old_rank != change.new_rank:
+        lines.append(tr("tt_medal_new", medal=MEDAL_EMOJIS[change.new_rank - 1], user_name=user_name,
+                        place=tr(f"medal_place_{change.new_rank}"), track_name=display_track_name))
+        # Cada superado baja exactamente un puesto: el i-ésimo estaba en new_rank + i
+        for i, passed_id in enumerate(change.passed_user_ids):
+            previous_rank = change.new_rank + i
+            if previous_rank > len(MEDAL_PLACES):
+                break
+            label = passed_labels[i]
+            if previous_rank + 1 <= len(MEDAL_PLACES):
+                lines.append(tr("tt_medal_down", medal=MEDAL_EMOJIS[previous_rank], user_name=label, place=tr(f"medal_place_{previous_rank + 1}")))
+            else:
+                lines.append(tr("tt_medal_lost", user_name=label))
+    return lines
 
-    guild_id = str(interaction.guild.id) if interaction.guild else None
-    if not guild_id:
-        await interaction.followup.send(get_localized_string(None, "response_guild_only"))
-        return
-    
-    current_guild_data = load_guild_data(guild_id)
-    lang = current_guild_data.get('language', 'es')
 
-    # Obtener la clave de almacenamiento normalizada del input del usuario
-    input_storage_key = normalize_track_name(track_name)
-    # Obtener el nombre para mostrar en el título
-    display_track_name_title = get_display_track_name(input_storage_key, lang)
-
-    # --- Lógica para CONSOLIDAR tiempos de la pista ---
-    track_entries_for_display = []
-    for json_track_key, entries in current_guild_data.items():
-        if normalize_track_name(json_track_key) == input_storage_key:
-            track_entries_for_display.extend(entries) 
-    
-    if not track_entries_for_display:
-        track_times_for_track = {} 
-    else:
-        track_times_for_track_raw = {}
-        for entry in track_entries_for_display:
-            user_id = entry["user_id"]
-            if user_id not in track_times_for_track_raw or \
-               time_to_ms(entry["time"]) < time_to_ms(track_times_for_track_raw[user_id]["time"]):
-                track_times_for_track_raw[user_id] = entry
-        track_times_for_track = track_times_for_track_raw 
-
-    all_user_data = []
-    
-    all_members = interaction.guild.members 
+# --- CACHÉ DE EMBEDS RENDERIZADOS ---
+RENDER_CACHE_MAX_ENTRIES = 64 # Por guild
 
-    for member in all_members:
-        if member.bot:
-            continue
-        
-        user_id_str = str(member.id)
-        
-        if user_id_str in track_times_for_track:
-            entry = track_times_for_track[user_id_str]
-            all_user_data.append({
-                "user_id": user_id_str,
-                "user_name": member.display_name,
-                "time": entry["time"],
-                "url_evidence": entry.get("url_evidence"),
-                "has_time": True
-            })
-        else:
-            all_user_data.append({
-                "user_id": user_id_str,
-                "user_name": member.display_name,
-                "time": get_localized_string(guild_id, "ttshow_time_missing"), 
-                "url_evidence": None,
-                "has_time": False
-            })
+def cached_render(guild_id, key, render):
+    """
+    Devuelve el resultado de render() para (key, versión de datos del guild),
+    reutilizándolo mientras el guild no cambie. Cada /tt o /tt-language sube
+    la versión, así que lo guardado con la versión anterior ya no se usa.
+    Los embeds guardados se comparten entre respuestas: no modificarlos.
+    """
+    cache = guild_store.derived(guild_id).setdefault('render_cache', OrderedDict())
+    full_key = key + (guild_store.version(guild_id),)
+    if full_key in cache:
+        metrics.inc('ttbot_render_cache_requests_total', result='hit')
+        cache.move_to_end(full_key)
+        return cache[full_key]
+    metrics.inc('ttbot_render_cache_requests_total', result='miss')
+    result = render()
+    cache[full_key] = result
+    while len(cache) > RENDER_CACHE_MAX_ENTRIES:
+        cache.popitem(last=False)
+    return result
+
+
+# --- AGRUPACIÓN DE PETICIONES IDÉNTICAS EN CURSO ---
+class SingleFlight:
+    """
+    Agrupa peticiones idénticas simultáneas: la primera lanza el cálculo
+    (carga + renderizado) y las que llegan mientras sigue en curso esperan
+    ese mismo resultado en lugar de repetirlo. Cada comando responde luego
+    con su propio followup. No guarda nada: al terminar, la clave se libera.
+    """
 
-    def custom_sort_key(item):
-        if item["has_time"]:
-            return (0, time_to_ms(item["time"]))
+    def __init__(self, name):
+        self.name = name
+        self._in_flight = {} # clave -> tarea en curso
+
+    async def run(self, key, compute):
+        task = self._in_flight.get(key)
+        if task is None:
+            metrics.inc('ttbot_singleflight_requests_total', flight=self.name, result='leader')
+            task = asyncio.create_task(compute())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._in_flight.pop(key, None) if self._in_flight.get(key) is done else None)
         else:
-            return (1, item["user_name"].lower())
-            
-    all_user_data.sort(key=custom_sort_key)
+            metrics.inc('ttbot_singleflight_requests_total', flight=self.name, result='shared')
+        # shield: si se cancela un comando, el cálculo sigue para los demás que lo esperan
+        return await asyncio.shield(task)
+
+
+render_flights = SingleFlight('render')
+
+
+# --- RENDERIZADO PAGINADO DE /tt-show ---
+TTSHOW_PAGE_SIZE = 20
+EMBED_DESCRIPTION_LIMIT = 4096
+
+def render_times_page(guild, guild_data, storage_key, link, participants_only, page):
+    """
+    Construye el embed de una sola página de /tt-show. Las filas con tiempo
+    salen del ranking de la pista; las de miembros sin tiempo (si se listan)
+    van después en orden alfabético. Devuelve (embed, página, total de páginas).
+    """
+    guild_id = str(guild.id)
+    lang = guild_data.get('language', 'es')
+    tr = get_localizer(guild_id)
+    ranking = get_track_ranking(guild_id, guild_data, storage_key)
+    member_index = get_member_index(guild)
+
+    ranked_count = len(ranking)
+    ranked_members = get_ranked_members(guild_id, guild_data, storage_key, member_index)
+    non_participant_count = len(member_index) - len(ranked_members)
+    total_rows = ranked_count if participants_only else ranked_count + non_participant_count
+    pages = max(1, -(-total_rows // TTSHOW_PAGE_SIZE))
+    page = min(max(page, 1), pages)
+    start = (page - 1) * TTSHOW_PAGE_SIZE
+    stop = start + TTSHOW_PAGE_SIZE
 
-    description_parts = []
-    
     COL_RANK_WIDTH = 3   
     COL_DRIVER_WIDTH = 15 
     COL_TIME_WIDTH = 11  
     COL_ZELDA_WIDTH = 5   
 
     table_header_cols = [
-        f"{get_localized_string(guild_id, 'ttshow_col_rank'):<{COL_RANK_WIDTH}}", 
-        f"{get_localized_string(guild_id, 'ttshow_col_pilot'):<{COL_DRIVER_WIDTH}}", 
-        f"{get_localized_string(guild_id, 'ttshow_col_time'):<{COL_TIME_WIDTH}}"
+        f"{tr('ttshow_col_rank'):<{COL_RANK_WIDTH}}", 
+        f"{tr('ttshow_col_pilot'):<{COL_DRIVER_WIDTH}}", 
+        f"{tr('ttshow_col_time'):<{COL_TIME_WIDTH}}"
     ]
     table_separator_cols = [
         f"{'-'*COL_RANK_WIDTH}", 
@@ -581,73 +2347,140 @@ async def show_times(interaction: discord.Interaction, track_name: str, link: bo
     ]
     
     if link: 
-        table_header_cols.append(f"{get_localized_string(guild_id, 'ttshow_col_zelda'):<{COL_ZELDA_WIDTH}}")
+        table_header_cols.append(f"{tr('ttshow_col_zelda'):<{COL_ZELDA_WIDTH}}")
         table_separator_cols.append(f"{'-'*COL_ZELDA_WIDTH}")
 
-    table_header = " | ".join(table_header_cols)
-    table_separator = "-|-".join(table_separator_cols)
-    
-    table_rows = [table_header, table_separator]
-    
+    table_rows = [" | ".join(table_header_cols), "-|-".join(table_separator_cols)]
     evidence_urls_list = []
-    rank_counter = 0
-
-    for i, entry in enumerate(all_user_data):
-        driver_name = entry['user_name']
-        time_val = entry['time'] 
-        url_link = entry.get('url_evidence')
-        
-        if len(driver_name) > COL_DRIVER_WIDTH:
-            driver_name = driver_name[:COL_DRIVER_WIDTH-3] + "..."
-
-        display_rank = ""
-        display_link_ref = get_localized_string(guild_id, "ttshow_link_na") 
-        
-        row_cols = []
-
-        if entry["has_time"]:
-            rank_counter += 1
-            display_rank = f"{rank_counter}."
-            row_cols.append(f"{display_rank:<{COL_RANK_WIDTH}}") 
-            row_cols.append(f"{driver_name:<{COL_DRIVER_WIDTH}}") 
-            row_cols.append(f"{time_val:<{COL_TIME_WIDTH}}") 
+    link_na_text = tr("ttshow_link_na")
+
+    def driver_cell(name):
+        if len(name) > COL_DRIVER_WIDTH:
+            name = name[:COL_DRIVER_WIDTH-3] + "..."
+        return f"{name:<{COL_DRIVER_WIDTH}}"
+
+    # Filas con tiempo de esta página, directamente desde el ranking
+    for offset, entry in enumerate(ranking.page(start, min(stop, ranked_count))):
+        rank = start + offset + 1
+        user_id = entry.user_id
+        driver_name = (member_index.display_name_of(int(user_id)) if user_id.isdigit() else None) or entry.user_name or user_id
+        row_cols = [f"{f'{rank}.':<{COL_RANK_WIDTH}}", driver_cell(driver_name), f"{entry.time:<{COL_TIME_WIDTH}}"]
+        if link:
+            display_link_ref = link_na_text
+            url_link = entry.url_evidence
+            if url_link:
+                display_link_ref = "+" 
+                evidence_urls_list.append(f"[{rank}] {url_link}")
+            row_cols.append(f"{display_link_ref:<{COL_ZELDA_WIDTH}}")
+        table_rows.append(" | ".join(row_cols))
 
+    # Filas de miembros sin tiempo (solo si la página llega hasta ellas)
+    if not participants_only and stop > ranked_count:
+        first = max(0, start - ranked_count)
+        time_missing_text = tr("ttshow_time_missing")
+        for display_name, _ in ranked_members.unranked_members(member_index, first, first + stop - max(start, ranked_count)):
+            row_cols = [f"{'':<{COL_RANK_WIDTH}}", driver_cell(display_name), f"{time_missing_text:<{COL_TIME_WIDTH}}"]
             if link:
-                if url_link:
-                    display_link_ref = "+" 
-                    evidence_urls_list.append(f"[{rank_counter}] {url_link}")
-                row_cols.append(f"{display_link_ref:<{COL_ZELDA_WIDTH}}")
+                row_cols.append(f"{link_na_text:<{COL_ZELDA_WIDTH}}")
+            table_rows.append(" | ".join(row_cols))
 
-        else: 
-            row_cols.append(f"{display_rank:<{COL_RANK_WIDTH}}") 
-            row_cols.append(f"{driver_name:<{COL_DRIVER_WIDTH}}") 
-            row_cols.append(f"{time_val:<{COL_TIME_WIDTH}}") 
+    description_parts = ["```ansi\n" + "\n".join(table_rows) + "\n```"]
 
-            if link:
-                row_cols.append(f"{display_link_ref:<{COL_ZELDA_WIDTH}}")
-
-        table_rows.append(" | ".join(row_cols))
-    
-    description_parts.append("```ansi\n" + "\n".join(table_rows) + "\n```")
+    if total_rows == 0:
+        description_parts.append(tr("ttshow_no_times") if participants_only else tr("ttshow_no_members"))
+    if participants_only and non_participant_count > 0:
+        description_parts.append(tr("ttshow_non_participants", count=non_participant_count))
 
     if link and evidence_urls_list:
-        description_parts.append(f"\n**__{get_localized_string(guild_id, 'ttshow_evidence_section_title')}__**")
-        description_parts.extend(evidence_urls_list)
-
-    if not all_user_data:
-        description_parts.append(get_localized_string(guild_id, "ttshow_no_members"))
-
+        description_parts.append(f"\n**__{tr('ttshow_evidence_section_title')}__**")
+        # No pasar del límite de Discord para la descripción de un embed
+        length = sum(len(part) + 1 for part in description_parts)
+        for evidence_line in evidence_urls_list:
+            length += len(evidence_line) + 1
+            if length > EMBED_DESCRIPTION_LIMIT:
+                break
+            description_parts.append(evidence_line)
 
     embed = discord.Embed(
-        title=get_localized_string(guild_id, "ttshow_title", track_name=display_track_name_title), 
+        title=tr("ttshow_title", track_name=get_display_track_name(storage_key, lang)), 
         description="\n".join(description_parts),
         color=discord.Color.blue()
     )
-    embed.set_footer(text=get_localized_string(guild_id, "ttshow_footer"))
+    footer = tr("ttshow_footer_participants") if participants_only else tr("ttshow_footer")
+    embed.set_footer(text=f"{footer}\n{tr('ttshow_page', page=page, pages=pages)}")
+    return embed, page, pages
 
-    await interaction.followup.send(embed=embed)
 
-@bot.tree.command(name="tt-tracks", description=LANG_DATA['es']['command_tttracks_desc'])
+def get_times_page(guild, guild_data, storage_key, link, participants_only, page):
+    """render_times_page con caché: la página se reutiliza mientras no cambien los datos ni los miembros del guild."""
+    guild_id = str(guild.id)
+    key = ('tt-show', storage_key, guild_data.get('language', 'es'), link, participants_only, page, get_member_index(guild).version)
+    return cached_render(guild_id, key, lambda: render_times_page(guild, guild_data, storage_key, link, participants_only, page))
+
+
+class TimesPageView(discord.ui.View):
+    """Botones para moverse entre las páginas de /tt-show; cada página se renderiza al pedirla."""
+
+    def __init__(self, guild, storage_key, link, participants_only, page, pages):
+        super().__init__(timeout=300)
+        self.guild = guild
+        self.storage_key = storage_key
+        self.link = link
+        self.participants_only = participants_only
+        self.page = page
+        self.pages = pages
+        self._update_buttons()
+
+    def _update_buttons(self):
+        self.previous_page.disabled = self.page <= 1
+        self.next_page.disabled = self.page >= self.pages
+
+    async def _show_page(self, interaction, page):
+        guild_data = await load_guild_data(str(self.guild.id))
+        embed, self.page, self.pages = get_times_page(self.guild, guild_data, self.storage_key, self.link, self.participants_only, page)
+        self._update_buttons()
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @discord.ui.button(label="◀", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show_page(interaction, self.page - 1)
+
+    @discord.ui.button(label="▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show_page(interaction, self.page + 1)
+
+
+@bot.tree.command(name="tt-show", description=command_text('command_ttshow_desc'))
+@app_commands.autocomplete(track_name=track_name_autocomplete) 
+@discord.app_commands.describe(
+    track_name=command_text('command_ttshow_track_name_desc'),
+    link=command_text('command_ttshow_link_desc'),
+    participants_only=command_text('command_ttshow_participants_only_desc'),
+    page=command_text('command_ttshow_page_desc')
+)
+async def show_times(interaction: discord.Interaction, track_name: str, link: bool = False, participants_only: bool = False, page: int = 1):
+    await interaction.response.defer() 
+
+    guild_id = str(interaction.guild.id) if interaction.guild else None
+    if not guild_id:
+        await interaction.followup.send(get_localized_string(None, "response_guild_only"))
+        return
+    
+    # Obtener la clave de almacenamiento normalizada del input del usuario
+    input_storage_key = normalize_track_name(track_name)
+
+    async def render_page():
+        current_guild_data = await load_guild_data(guild_id)
+        return get_times_page(interaction.guild, current_guild_data, input_storage_key, link, participants_only, page)
+
+    # Varias peticiones iguales a la vez (p. ej. tras anunciar un resultado) comparten una sola carga y renderizado
+    embed, page, pages = await render_flights.run((guild_id, 'tt-show', input_storage_key, link, participants_only, page), render_page)
+    if pages > 1:
+        await interaction.followup.send(embed=embed, view=TimesPageView(interaction.guild, input_storage_key, link, participants_only, page, pages))
+    else:
+        await interaction.followup.send(embed=embed)
+
+@bot.tree.command(name="tt-tracks", description=command_text('command_tttracks_desc'))
 async def list_tracks(interaction: discord.Interaction):
     await interaction.response.defer()
 
@@ -656,76 +2489,81 @@ async def list_tracks(interaction: discord.Interaction):
         await interaction.followup.send(get_localized_string(None, "response_guild_only"))
         return
     
-    current_guild_data = load_guild_data(guild_id) 
+    current_guild_data = await load_guild_data(guild_id) 
     lang = current_guild_data.get('language', 'es')
+    tr = get_localizer(guild_id)
 
     if not current_guild_data:
-        await interaction.followup.send(get_localized_string(guild_id, "tttracks_no_tracks"))
+        await interaction.followup.send(tr("tttracks_no_tracks"))
         return
 
-    consolidated_tracks = {} 
+    def build_tracks_embed():
+        consolidated_tracks = {} 
 
-    for json_track_key, entries in current_guild_data.items(): 
-        # Asegurarse de que 'entries' es una lista antes de intentar iterar
-        if not isinstance(entries, list):
-            continue # Saltar si no es una lista de entradas de pista (ej. la clave 'language')
+        for json_track_key, entries in current_guild_data.items(): 
+            # Asegurarse de que 'entries' es una lista antes de intentar iterar
+            if not isinstance(entries, list):
+                continue # Saltar si no es una lista de entradas de pista (ej. la clave 'language')
 
-        storage_key = normalize_track_name(json_track_key)
-        display_name = get_display_track_name(storage_key, lang) # Usar idioma
+            # Las claves ya son canónicas y sin usuarios repetidos (ver canonicalize_guild_tracks)
+            display_name = get_display_track_name(json_track_key, lang) # Usar idioma
         
-        unique_users_for_storage_key = len({entry["user_id"] for entry in entries})
+            unique_users_for_storage_key = len(entries)
         
-        if display_name in consolidated_tracks:
-            consolidated_tracks[display_name] += unique_users_for_storage_key
-        else:
-            consolidated_tracks[display_name] = unique_users_for_storage_key
+            if display_name in consolidated_tracks:
+                consolidated_tracks[display_name] += unique_users_for_storage_key
+            else:
+                consolidated_tracks[display_name] = unique_users_for_storage_key
     
-    track_data_list = []
-    for track_name_display, count in consolidated_tracks.items():
-        track_data_list.append({
-            "track_name": track_name_display, 
-            "subidos_count": count
-        })
+        track_data_list = []
+        for track_name_display, count in consolidated_tracks.items():
+            track_data_list.append({
+                "track_name": track_name_display, 
+                "subidos_count": count
+            })
     
-    track_data_list.sort(key=lambda x: x["track_name"].lower()) 
+        track_data_list.sort(key=lambda x: x["track_name"].lower()) 
 
-    description_parts = []
+        description_parts = []
 
-    COL_TRACK_WIDTH = 20 
-    COL_SUBIDOS_WIDTH = 8 
+        COL_TRACK_WIDTH = 20 
+        COL_SUBIDOS_WIDTH = 8 
 
-    table_header = f"{get_localized_string(guild_id, 'tttracks_col_track'):<{COL_TRACK_WIDTH}} | {get_localized_string(guild_id, 'tttracks_col_subidos'):<{COL_SUBIDOS_WIDTH}}"
-    table_separator = f"{'-'*COL_TRACK_WIDTH}-|-{'-'*COL_SUBIDOS_WIDTH}"
+        table_header = f"{tr('tttracks_col_track'):<{COL_TRACK_WIDTH}} | {tr('tttracks_col_subidos'):<{COL_SUBIDOS_WIDTH}}"
+        table_separator = f"{'-'*COL_TRACK_WIDTH}-|-{'-'*COL_SUBIDOS_WIDTH}"
     
-    table_rows = [table_header, table_separator]
+        table_rows = [table_header, table_separator]
 
-    for track_data in track_data_list:
-        track_name_display = track_data["track_name"]
-        subidos_count = track_data["subidos_count"]
+        for track_data in track_data_list:
+            track_name_display = track_data["track_name"]
+            subidos_count = track_data["subidos_count"]
 
-        if len(track_name_display) > COL_TRACK_WIDTH:
-            track_name_display = track_name_display[:COL_TRACK_WIDTH-3] + "..."
+            if len(track_name_display) > COL_TRACK_WIDTH:
+                track_name_display = track_name_display[:COL_TRACK_WIDTH-3] + "..."
 
-        table_rows.append(
-            f"{track_name_display:<{COL_TRACK_WIDTH}} | {str(subidos_count):<{COL_SUBIDOS_WIDTH}}"
-        )
+            table_rows.append(
+                f"{track_name_display:<{COL_TRACK_WIDTH}} | {str(subidos_count):<{COL_SUBIDOS_WIDTH}}"
+            )
     
-    description_parts.append("```ansi\n" + "\n".join(table_rows) + "\n```")
+        description_parts.append("```ansi\n" + "\n".join(table_rows) + "\n```")
 
-    embed = discord.Embed(
-        title=get_localized_string(guild_id, "tttracks_title"),
-        description="\n".join(description_parts),
-        color=discord.Color.green()
-    )
-    embed.set_footer(text=get_localized_string(guild_id, "tttracks_footer"))
+        embed = discord.Embed(
+            title=tr("tttracks_title"),
+            description="\n".join(description_parts),
+            color=discord.Color.green()
+        )
+        embed.set_footer(text=tr("tttracks_footer"))
+        return embed
+
+    embed = cached_render(guild_id, ('tt-tracks', lang), build_tracks_embed)
 
     await interaction.followup.send(embed=embed)
 
 # --- NUEVO COMANDO /tt-user ---
-@bot.tree.command(name="tt-user", description=LANG_DATA['es']['command_ttuser_desc'])
+@bot.tree.command(name="tt-user", description=command_text('command_ttuser_desc'))
 @app_commands.autocomplete(username=username_autocomplete) 
 @discord.app_commands.describe(
-    username=LANG_DATA['es']['command_ttuser_username_desc']
+    username=command_text('command_ttuser_username_desc')
 )
 async def tt_user(interaction: discord.Interaction, username: str):
     await interaction.response.defer()
@@ -735,88 +2573,77 @@ async def tt_user(interaction: discord.Interaction, username: str):
         await interaction.followup.send(get_localized_string(None, "response_guild_only"))
         return
 
-    current_guild_data = load_guild_data(guild_id)
+    current_guild_data = await load_guild_data(guild_id)
     lang = current_guild_data.get('language', 'es')
+    tr = get_localizer(guild_id)
 
-    target_member = None
-    if username.isdigit(): 
-        target_member = interaction.guild.get_member(int(username))
-    else: 
-        for member in interaction.guild.members:
-            if member.display_name == username:
-                target_member = member
-                break
+    target_member = find_member(interaction.guild, username)
     
     if not target_member:
-        await interaction.followup.send(get_localized_string(guild_id, "ttuser_not_found", username=username))
+        await interaction.followup.send(tr("ttuser_not_found", username=username))
         return
 
     user_id_str = str(target_member.id)
     user_display_name = target_member.display_name
 
-    user_times = []
-    for storage_key, entries in current_guild_data.items():
-        # Asegurarse de que 'entries' es una lista antes de intentar iterar
-        if not isinstance(entries, list):
-            continue # Saltar si no es una lista de entradas de pista (ej. la clave 'language')
-
-        best_time_for_user_on_track = None
-        for entry in entries:
-            if entry["user_id"] == user_id_str:
-                if best_time_for_user_on_track is None or \
-                   time_to_ms(entry["time"]) < time_to_ms(best_time_for_user_on_track["time"]):
-                    best_time_for_user_on_track = entry
-        
-        if best_time_for_user_on_track:
-            user_times.append({
+    def build_user_embed():
+        user_times = [
+            {
                 "track_name": get_display_track_name(storage_key, lang), 
-                "time": best_time_for_user_on_track["time"]
-            })
+                "time": entry.time
+            }
+            for storage_key, entry in get_user_index(guild_id, current_guild_data).get(user_id_str, {}).items()
+        ]
     
-    if not user_times:
-        await interaction.followup.send(get_localized_string(guild_id, "ttuser_no_times", user_display_name=user_display_name))
-        return
+        if not user_times:
+            return None
 
-    user_times.sort(key=lambda x: x["track_name"].lower())
+        user_times.sort(key=lambda x: x["track_name"].lower())
 
-    description_parts = []
+        description_parts = []
 
-    COL_TRACK_WIDTH = 20 
-    COL_TIME_WIDTH = 11  
+        COL_TRACK_WIDTH = 20 
+        COL_TIME_WIDTH = 11  
 
-    table_header = f"{get_localized_string(guild_id, 'ttuser_col_track'):<{COL_TRACK_WIDTH}} | {get_localized_string(guild_id, 'ttuser_col_time'):<{COL_TIME_WIDTH}}"
-    table_separator = f"{'-'*COL_TRACK_WIDTH}-|-{'-'*COL_TIME_WIDTH}"
+        table_header = f"{tr('ttuser_col_track'):<{COL_TRACK_WIDTH}} | {tr('ttuser_col_time'):<{COL_TIME_WIDTH}}"
+        table_separator = f"{'-'*COL_TRACK_WIDTH}-|-{'-'*COL_TIME_WIDTH}"
     
-    table_rows = [table_header, table_separator]
+        table_rows = [table_header, table_separator]
 
-    for entry in user_times:
-        track_name_display = entry["track_name"]
-        time_val = entry["time"]
+        for entry in user_times:
+            track_name_display = entry["track_name"]
+            time_val = entry["time"]
 
-        if len(track_name_display) > COL_TRACK_WIDTH:
-            track_name_display = track_name_display[:COL_TRACK_WIDTH-3] + "..."
+            if len(track_name_display) > COL_TRACK_WIDTH:
+                track_name_display = track_name_display[:COL_TRACK_WIDTH-3] + "..."
 
-        table_rows.append(
-            f"{track_name_display:<{COL_TRACK_WIDTH}} | {time_val:<{COL_TIME_WIDTH}}"
-        )
+            table_rows.append(
+                f"{track_name_display:<{COL_TRACK_WIDTH}} | {time_val:<{COL_TIME_WIDTH}}"
+            )
     
-    description_parts.append("```ansi\n" + "\n".join(table_rows) + "\n```")
+        description_parts.append("```ansi\n" + "\n".join(table_rows) + "\n```")
 
-    embed = discord.Embed(
-        title=get_localized_string(guild_id, "ttuser_title", user_display_name=user_display_name),
-        description="\n".join(description_parts),
-        color=discord.Color.purple() 
-    )
-    embed.set_footer(text=get_localized_string(guild_id, "ttuser_footer"))
+        embed = discord.Embed(
+            title=tr("ttuser_title", user_display_name=user_display_name),
+            description="\n".join(description_parts),
+            color=discord.Color.purple() 
+        )
+        embed.set_footer(text=tr("ttuser_footer"))
+        return embed
+
+    embed = cached_render(guild_id, ('tt-user', lang, user_id_str, user_display_name), build_user_embed)
+    if embed is None:
+        await interaction.followup.send(tr("ttuser_no_times", user_display_name=user_display_name))
+        return
 
     await interaction.followup.send(embed=embed)
 
 
 # --- NUEVO COMANDO /tt-leaderboard ---
-@bot.tree.command(name="tt-leaderboard", description=LANG_DATA['es']['command_ttleaderboard_desc'])
+@bot.tree.command(name="tt-leaderboard", description=command_text('command_ttleaderboard_desc'))
 @app_commands.autocomplete(username=username_autocomplete) 
 @discord.app_commands.describe(
-    username=LANG_DATA['es']['command_ttleaderboard_username_desc']
+    username=command_text('command_ttleaderboard_username_desc')
 )
 async def tt_leaderboard(interaction: discord.Interaction, username: str = None): 
     await interaction.response.defer()
@@ -826,13 +2653,6 @@ async def tt_leaderboard(interaction: discord.Interaction, username: str = None)
         await interaction.followup.send(get_localized_string(None, "response_guild_only"))
         return
 
-    current_guild_data = load_guild_data(guild_id)
-    lang = current_guild_data.get('language', 'es')
-
-    if not current_guild_data:
-        await interaction.followup.send(get_localized_string(guild_id, "ttleaderboard_no_data"))
-        return
-
     # Emojis para las medallas
     MEDAL_GOLD = "🥇"
     MEDAL_SILVER = "🥈"
@@ -840,185 +2660,131 @@ async def tt_leaderboard(interaction: discord.Interaction, username: str = None)
 
     # --- Lógica para un usuario específico ---
     if username:
-        target_member = None
-        if username.isdigit(): 
-            target_member = interaction.guild.get_member(int(username))
-        else:
-            for member in interaction.guild.members:
-                if member.display_name == username:
-                    target_member = member
-                    break
+        target_member = find_member(interaction.guild, username)
         
         if not target_member:
-            await interaction.followup.send(get_localized_string(guild_id, "ttuser_not_found", username=username))
+            tr = await load_localizer(guild_id)
+            await interaction.followup.send(tr("ttuser_not_found", username=username))
             return
         
         user_id_str = str(target_member.id)
         user_display_name = target_member.display_name
 
-        user_medals_breakdown = {
-            '1st_places': [], 
-            '2nd_places': [],
-            '3rd_places': []
-        }
-
-        # Consolidar todos los tiempos de todas las pistas bajo sus claves de almacenamiento canónicas
-        consolidated_guild_data_for_user_breakdown = {}
-        for json_track_key, entries in current_guild_data.items():
-            # Asegurarse de que 'entries' es una lista antes de intentar iterar
-            if not isinstance(entries, list):
-                continue # Saltar si no es una lista de entradas de pista (ej. la clave 'language')
-
-            canonical_storage_key = normalize_track_name(json_track_key)
-            if canonical_storage_key not in consolidated_guild_data_for_user_breakdown:
-                consolidated_guild_data_for_user_breakdown[canonical_storage_key] = []
-            consolidated_guild_data_for_user_breakdown[canonical_storage_key].extend(entries)
-
-        for storage_key, entries in consolidated_guild_data_for_user_breakdown.items(): 
-            if not entries:
-                continue
-
-            track_best_times = {}
-            for entry in entries:
-                user_id = entry["user_id"]
-                if user_id not in track_best_times or \
-                   time_to_ms(entry["time"]) < time_to_ms(track_best_times[user_id]["time"]):
-                    track_best_times[user_id] = entry
-            
-            sorted_track_times = sorted(track_best_times.values(), key=lambda x: time_to_ms(x["time"]))
-
-            if len(sorted_track_times) >= 1 and sorted_track_times[0]["user_id"] == user_id_str:
-                user_medals_breakdown['1st_places'].append(f"**{get_display_track_name(storage_key, lang)}** (`{sorted_track_times[0]['time']}`)")
-            
-            if len(sorted_track_times) >= 2 and sorted_track_times[1]["user_id"] == user_id_str:
-                user_medals_breakdown['2nd_places'].append(f"**{get_display_track_name(storage_key, lang)}** (`{sorted_track_times[1]['time']}`)")
-            
-            if len(sorted_track_times) >= 3 and sorted_track_times[2]["user_id"] == user_id_str:
-                user_medals_breakdown['3rd_places'].append(f"**{get_display_track_name(storage_key, lang)}** (`{sorted_track_times[2]['time']}`)")
+        def build_breakdown_embed(current_guild_data, lang, tr):
+            user_medals_breakdown = {
+                '1st_places': [], 
+                '2nd_places': [],
+                '3rd_places': []
+            }
+
+            # Solo hace falta mirar el podio de las pistas en las que el usuario tiene tiempo
+            podiums = get_medal_view(guild_id, current_guild_data)['podiums']
+            for storage_key in get_user_index(guild_id, current_guild_data).get(user_id_str, {}):
+                for place, (podium_user_id, podium_time) in zip(MEDAL_PLACES, podiums.get(storage_key, [])):
+                    if podium_user_id == user_id_str:
+                        user_medals_breakdown[f'{place}_places'].append(f"**{get_display_track_name(storage_key, lang)}** (`{podium_time}`)")
         
-        embed = discord.Embed(
-            title=get_localized_string(guild_id, "ttleaderboard_breakdown_title", user_name=user_display_name),
-            color=discord.Color.blue()
-        )
-
-        if user_medals_breakdown['1st_places']:
-            embed.add_field(name=get_localized_string(guild_id, "ttleaderboard_breakdown_1st", count=len(user_medals_breakdown['1st_places'])), 
-                            value="\n".join(user_medals_breakdown['1st_places']), inline=False)
-        if user_medals_breakdown['2nd_places']:
-            embed.add_field(name=get_localized_string(guild_id, "ttleaderboard_breakdown_2nd", count=len(user_medals_breakdown['2nd_places'])), 
-                            value="\n".join(user_medals_breakdown['2nd_places']), inline=False)
-        if user_medals_breakdown['3rd_places']:
-            embed.add_field(name=get_localized_string(guild_id, "ttleaderboard_breakdown_3rd", count=len(user_medals_breakdown['3rd_places'])), 
-                            value="\n".join(user_medals_breakdown['3rd_places']), inline=False)
+            embed = discord.Embed(
+                title=tr("ttleaderboard_breakdown_title", user_name=user_display_name),
+                color=discord.Color.blue()
+            )
+
+            if user_medals_breakdown['1st_places']:
+                embed.add_field(name=tr("ttleaderboard_breakdown_1st", count=len(user_medals_breakdown['1st_places'])), 
+                                value="\n".join(user_medals_breakdown['1st_places']), inline=False)
+            if user_medals_breakdown['2nd_places']:
+                embed.add_field(name=tr("ttleaderboard_breakdown_2nd", count=len(user_medals_breakdown['2nd_places'])), 
+                                value="\n".join(user_medals_breakdown['2nd_places']), inline=False)
+            if user_medals_breakdown['3rd_places']:
+                embed.add_field(name=tr("ttleaderboard_breakdown_3rd", count=len(user_medals_breakdown['3rd_places'])), 
+                                value="\n".join(user_medals_breakdown['3rd_places']), inline=False)
         
-        if not (user_medals_breakdown['1st_places'] or user_medals_breakdown['2nd_places'] or user_medals_breakdown['3rd_places']):
-            embed.description = get_localized_string(guild_id, "ttleaderboard_breakdown_no_medals", user_name=user_display_name)
+            if not (user_medals_breakdown['1st_places'] or user_medals_breakdown['2nd_places'] or user_medals_breakdown['3rd_places']):
+                embed.description = tr("ttleaderboard_breakdown_no_medals", user_name=user_display_name)
+
+            embed.set_footer(text=tr("ttleaderboard_breakdown_footer"))
+            return embed
 
-        embed.set_footer(text=get_localized_string(guild_id, "ttleaderboard_breakdown_footer"))
+        async def render_breakdown():
+            current_guild_data = await load_guild_data(guild_id)
+            lang = current_guild_data.get('language', 'es')
+            tr = get_localizer(guild_id) # Ya cargado: coincide con lang, que forma parte de la clave de caché
+            return cached_render(guild_id, ('tt-leaderboard', lang, user_id_str, user_display_name), lambda: build_breakdown_embed(current_guild_data, lang, tr))
+
+        embed = await render_flights.run((guild_id, 'tt-leaderboard', user_id_str, user_display_name), render_breakdown)
         await interaction.followup.send(embed=embed)
         return 
 
     # --- Lógica para el Leaderboard General (si no se especificó un usuario) ---
     
-    leaderboard_data = {}
-
-    consolidated_guild_data_for_leaderboard = {}
-    for json_track_key, entries in current_guild_data.items():
-        # Asegurarse de que 'entries' es una lista antes de intentar iterar
-        if not isinstance(entries, list):
-            continue # Saltar si no es una lista de entradas de pista (ej. la clave 'language')
+    def build_leaderboard_embed(current_guild_data, tr):
+        leaderboard_list = get_medal_leaderboard(guild_id, current_guild_data)
 
-        canonical_storage_key = normalize_track_name(json_track_key)
-        if canonical_storage_key not in consolidated_guild_data_for_leaderboard:
-            consolidated_guild_data_for_leaderboard[canonical_storage_key] = []
-        consolidated_guild_data_for_leaderboard[canonical_storage_key].extend(entries)
+        top_10_leaderboard = leaderboard_list[:10]
 
-    for storage_key, entries in consolidated_guild_data_for_leaderboard.items(): 
-        if not entries: 
-            continue
-
-        track_best_times = {} 
-        for entry in entries:
-            user_id = entry["user_id"]
-            if user_id not in track_best_times or \
-               time_to_ms(entry["time"]) < time_to_ms(track_best_times[user_id]["time"]):
-                track_best_times[user_id] = entry
-        
-        sorted_track_times = sorted(track_best_times.values(), key=lambda x: time_to_ms(x["time"]))
+        if not top_10_leaderboard:
+            return None
 
-        if len(sorted_track_times) >= 1:
-            first_place_user_id = sorted_track_times[0]["user_id"]
-            leaderboard_data.setdefault(first_place_user_id, {'1st': 0, '2nd': 0, '3rd': 0, 'display_name': sorted_track_times[0]["user_name"]})
-            leaderboard_data[first_place_user_id]['1st'] += 1
+        description_parts = []
+    
+        for i, (user_id, stats) in enumerate(top_10_leaderboard):
+            rank = i + 1
+            display_name = stats['display_name'] 
         
-        if len(sorted_track_times) >= 2:
-            second_place_user_id = sorted_track_times[1]["user_id"]
-            leaderboard_data.setdefault(second_place_user_id, {'1st': 0, '2nd': 0, '3rd': 0, 'display_name': sorted_track_times[1]["user_name"]})
-            leaderboard_data[second_place_user_id]['2nd'] += 1
+            gold_count = stats['1st']
+            silver_count = stats['2nd']
+            bronze_count = stats['3rd']
+
+            medals_string = (
+                f"{MEDAL_GOLD}{gold_count} " if gold_count > 0 else ""
+            ) + (
+                f"{MEDAL_SILVER}{silver_count} " if silver_count > 0 else ""
+            ) + (
+                f"{MEDAL_BRONZE}{bronze_count}" if bronze_count > 0 else ""
+            )
         
-        if len(sorted_track_times) >= 3:
-            third_place_user_id = sorted_track_times[2]["user_id"]
-            leaderboard_data.setdefault(third_place_user_id, {'1st': 0, '2nd': 0, '3rd': 0, 'display_name': sorted_track_times[2]["user_name"]})
-            leaderboard_data[third_place_user_id]['3rd'] += 1
+            if not medals_string:
+                medals_string = tr("ttleaderboard_no_medals")
 
-    leaderboard_list = list(leaderboard_data.items())
+            description_parts.append(
+                f"**{rank}. {display_name}** {medals_string.strip()}"
+            )
 
-    leaderboard_list.sort(key=lambda item: (item[1]['1st'], item[1]['2nd'], item[1]['3rd']), reverse=True)
+        embed = discord.Embed(
+            title=tr("ttleaderboard_general_title"),
+            description="\n".join(description_parts),
+            color=discord.Color.gold() 
+        )
+        embed.set_footer(text=tr("ttleaderboard_general_footer"))
+        return embed
 
-    top_10_leaderboard = leaderboard_list[:10]
+    async def render_leaderboard():
+        current_guild_data = await load_guild_data(guild_id)
+        lang = current_guild_data.get('language', 'es')
+        tr = get_localizer(guild_id) # Ya cargado: coincide con lang, que forma parte de la clave de caché
+        return cached_render(guild_id, ('tt-leaderboard', lang), lambda: build_leaderboard_embed(current_guild_data, tr))
 
-    if not top_10_leaderboard:
+    embed = await render_flights.run((guild_id, 'tt-leaderboard'), render_leaderboard)
+    if embed is None:
         await interaction.followup.send(get_localized_string(guild_id, "ttleaderboard_not_enough_data"))
         return
 
-    description_parts = []
-    
-    for i, (user_id, stats) in enumerate(top_10_leaderboard):
-        rank = i + 1
-        display_name = stats['display_name'] 
-        
-        gold_count = stats['1st']
-        silver_count = stats['2nd']
-        bronze_count = stats['3rd']
-
-        medals_string = (
-            f"{MEDAL_GOLD}{gold_count} " if gold_count > 0 else ""
-        ) + (
-            f"{MEDAL_SILVER}{silver_count} " if silver_count > 0 else ""
-        ) + (
-            f"{MEDAL_BRONZE}{bronze_count}" if bronze_count > 0 else ""
-        )
-        
-        if not medals_string:
-            medals_string = get_localized_string(guild_id, "ttleaderboard_no_medals")
-
-        description_parts.append(
-            f"**{rank}. {display_name}** {medals_string.strip()}"
-        )
-
-    embed = discord.Embed(
-        title=get_localized_string(guild_id, "ttleaderboard_general_title"),
-        description="\n".join(description_parts),
-        color=discord.Color.gold() 
-    )
-    embed.set_footer(text=get_localized_string(guild_id, "ttleaderboard_general_footer"))
-
     await interaction.followup.send(embed=embed)
 
 # --- Sincronizar Comandos de Barra ---
 @bot.command(name='sync', help=LANG_DATA['es']['command_sync_help'])
 @commands.is_owner()
 async def sync_commands(ctx):
-    await bot.tree.sync()
+    await sync_command_tree(force=True)
     guild_id = str(ctx.guild.id) if ctx.guild else None
     await ctx.send(get_localized_string(guild_id, "response_sync_success"))
     print(get_localized_string(guild_id, "response_sync_success"))
 
 
 # --- NUEVO COMANDO /tt-language ---
-@bot.tree.command(name="tt-language", description=LANG_DATA['es']['command_language_desc'])
+@bot.tree.command(name="tt-language", description=command_text('command_language_desc'))
 @discord.app_commands.describe(
-    language=LANG_DATA['es']['command_language_lang_desc']
+    language=command_text('command_language_lang_desc')
 )
 @app_commands.choices(language=[
     app_commands.Choice(name="Español", value="es"),
@@ -1033,28 +2799,508 @@ async def tt_language(interaction: discord.Interaction, language: str):
         return
 
     guild_id = str(interaction.guild.id)
-    current_guild_data = load_guild_data(guild_id)
 
     if language not in LANG_DATA:
         await interaction.followup.send(get_localized_string(guild_id, "language_invalid"))
         return
 
-    current_guild_data['language'] = language
-    save_guild_data(guild_id, current_guild_data)
-    
-    # Sincronizar comandos para actualizar descripciones de comandos
+    async with guild_store.lock(guild_id):
+        current_guild_data = await load_guild_data(guild_id)
+        current_guild_data['language'] = language
+        await save_guild_data(guild_id, current_guild_data, wait=True, changed_rows=()) # Solo cambia el idioma
+    tr = get_localizer(guild_id)
+    # Sin resincronizar: las descripciones de los comandos ya llegan traducidas por LangDataTranslator
+    await interaction.followup.send(tr("language_set_success"))
+
+
+# --- NUEVO COMANDO /tt-import ---
+IMPORT_MAX_BYTES = int(os.getenv('TT_IMPORT_MAX_BYTES', str(5 * 1024 * 1024)))
+IMPORT_FIELDS = ('user_id', 'track', 'time', 'url_evidence', 'user_name') # user_name es opcional
+IMPORT_REJECTED_SHOWN = 10 # Filas rechazadas que se detallan en el resumen
+
+def iter_import_rows(text, filename):
+    """
+    Recorre las filas del archivo una a una, sin construir la lista completa.
+    Acepta JSON Lines (.jsonl/.json, un objeto por línea con las claves de
+    IMPORT_FIELDS) o CSV; en CSV la cabecera es opcional y sin ella las
+    columnas son user_id, track, time, url_evidence. Devuelve tuplas
+    (número de línea, valores en el orden de IMPORT_FIELDS), o None como
+    valores si la fila no se pudo leer.
+    """
+    stream = io.StringIO(text, newline='')
+    if filename.lower().endswith(('.jsonl', '.json')):
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                record = None
+            if not isinstance(record, dict):
+                yield line_number, None
+                continue
+            yield line_number, tuple(str(record.get(field) or '').strip() for field in IMPORT_FIELDS)
+        return
+
+    reader = csv.reader(stream)
+    columns = None
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error:
+            yield reader.line_num, None
+            continue
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        if columns is None:
+            header = [cell.strip().lower() for cell in row]
+            if 'user_id' in header:
+                # Cabecera (por ejemplo, la de /tt-export): leer las columnas por nombre
+                columns = [header.index(field) if field in header else None for field in IMPORT_FIELDS]
+                continue
+            columns = list(range(len(IMPORT_FIELDS)))
+        yield reader.line_num, tuple(row[i].strip() if i is not None and i < len(row) else '' for i in columns)
+
+def apply_import_rows(guild, guild_id, guild_data, rows):
+    """
+    Valida cada fila igual que /tt y aplica solo los tiempos que mejoran el
+    récord del usuario. Modifica guild_data en memoria sin guardarlo.
+    Devuelve (conteos por resultado, primeras filas rechazadas con su motivo,
+    {(clave de pista, user_id)} de las entradas modificadas).
+    """
+    counts = {'registered': 0, 'updated': 0, 'not_better': 0, 'rejected': 0}
+    rejected = []
+    changed_rows = set()
+    for line_number, values in rows:
+        reason = None
+        if values is None:
+            reason = "import_reason_unreadable"
+        else:
+            user_id, track, time_str, url_evidence, user_name = values
+            storage_key = normalize_track_name(track) if track else None
+            if not user_id.isdigit():
+                reason = "import_reason_user"
+            # Solo pistas conocidas o que ya existen en el guild, para que una errata no cree una pista nueva
+            elif not is_track_key(storage_key) or not (storage_key in TRACK_DISPLAY_NAMES or isinstance(guild_data.get(storage_key), list)):
+                reason = "import_reason_track"
+            elif not TIME_REGEX.match(time_str):
+                reason = "import_reason_time"
+            elif url_evidence and not is_valid_url(url_evidence):
+                reason = "import_reason_url"
+        if reason is not None:
+            counts['rejected'] += 1
+            if len(rejected) < IMPORT_REJECTED_SHOWN:
+                rejected.append((line_number, reason))
+            continue
+
+        member = guild.get_member(int(user_id))
+        user_name = member.display_name if member is not None else (user_name or user_id)
+        result, _, _ = record_time(guild_id, guild_data, storage_key, user_id, user_name, time_str, time_to_ms(time_str), url_evidence or None)
+        counts[result] += 1
+        if result != 'not_better':
+            changed_rows.add((storage_key, user_id))
+    return counts, rejected, changed_rows
+
+@bot.tree.command(name="tt-import", description=command_text('command_import_desc'))
+@discord.app_commands.describe(
+    file=command_text('command_import_file_desc')
+)
+@app_commands.default_permissions(manage_guild=True) # Solo administradores del servidor
+async def tt_import(interaction: discord.Interaction, file: discord.Attachment):
+    await interaction.response.defer(ephemeral=True) # Respuesta solo visible para el usuario
+
+    if not interaction.guild:
+        await interaction.followup.send(get_localized_string(None, "response_guild_only"))
+        return
+
+    guild_id = str(interaction.guild.id)
+    tr = await load_localizer(guild_id)
+    if not interaction.user.guild_permissions.manage_guild:
+        await interaction.followup.send(tr("response_admin_only"))
+        return
+
+    if file.size > IMPORT_MAX_BYTES:
+        await interaction.followup.send(tr("import_too_large", max_kb=IMPORT_MAX_BYTES // 1024))
+        return
+
+    # Decodificar antes de aplicar nada: un error de codificación a mitad de archivo dejaría la importación a medias
     try:
-        await bot.tree.sync()
-        print(f"Comandos sincronizados para guild {guild_id} después de cambio de idioma.")
-    except Exception as e:
-        print(f"Error al sincronizar comandos después de cambio de idioma: {e}")
+        text = (await file.read()).decode('utf-8-sig')
+    except UnicodeDecodeError:
+        await interaction.followup.send(tr("import_not_utf8"))
+        return
+
+    async with guild_store.lock(guild_id):
+        current_guild_data = await load_guild_data(guild_id)
+        counts, rejected, changed_rows = apply_import_rows(interaction.guild, guild_id, current_guild_data, iter_import_rows(text, file.filename))
+
+        # Una sola escritura para todo el archivo
+        if changed_rows:
+            await save_guild_data(guild_id, current_guild_data, wait=True, changed_rows=changed_rows)
+
+    lines = [tr("import_summary", **counts)]
+    if rejected:
+        lines.append(tr("import_rejected_header"))
+        lines.extend(tr("import_rejected_row", line=line_number, reason=tr(reason)) for line_number, reason in rejected)
+        if counts['rejected'] > len(rejected):
+            lines.append(tr("import_rejected_more", count=counts['rejected'] - len(rejected)))
+    await interaction.followup.send("\n".join(lines))
+
+
+# --- NUEVO COMANDO /tt-export ---
+EXPORT_SPOOL_MAX_BYTES = 1024 * 1024 # Hasta este tamaño el archivo se arma en memoria; por encima, en un temporal en disco
+# Hilos propios para armar las exportaciones: en GUILD_IO_EXECUTOR una exportación grande
+# retrasaría las cargas, los volcados y los diarios que /tt espera con el lock del guild
+EXPORT_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix='export')
+EXPORT_FIELDS = ('track',) + tuple(f'track_name_{lang}' for lang in LANG_DATA) + ('user_id', 'user_name', 'time', 'time_ms', 'url_evidence')
+
+def capture_export_tracks(guild_id, guild_data):
+    """
+    Copia de lo que se exporta, tomada en el bucle bajo el lock del guild: por pista,
+    sus nombres y las entradas de mejor a peor tiempo como tuplas inmutables.
+    """
+    tracks = []
+    for storage_key in sorted(key for key, value in guild_data.items() if isinstance(value, list)):
+        display_names = tuple(get_display_track_name(storage_key, lang) for lang in LANG_DATA)
+        ranking = get_track_ranking(guild_id, guild_data, storage_key)
+        tracks.append((storage_key, display_names, [entry.state() for entry in ranking.iter_entries()]))
+    return tracks
+
+def iter_export_rows(captured_tracks):
+    """Filas a exportar en el orden de EXPORT_FIELDS: pista por pista y, en cada una, de mejor a peor tiempo."""
+    for storage_key, display_names, states in captured_tracks:
+        for state in states:
+            entry = TimeEntry.dict_from_state(state)
+            yield (storage_key,) + display_names + (entry["user_id"], entry["user_name"], entry["time"], entry["time_ms"], entry["url_evidence"])
+
+def write_export(rows, export_format):
+    """
+    Escribe las filas de una en una en un archivo temporal "spooled" (en
+    memoria mientras es pequeño) como CSV con cabecera o como JSON Lines.
+    Devuelve (archivo posicionado al inicio, filas escritas, bytes escritos).
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES, mode='w+b')
+    text = io.TextIOWrapper(spool, encoding='utf-8', newline='')
+    count = 0
+    if export_format == 'csv':
+        writer = csv.writer(text)
+        writer.writerow(EXPORT_FIELDS)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    else:
+        for row in rows:
+            text.write(json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False) + "\n")
+            count += 1
+    text.flush()
+    text.detach() # Soltar el envoltorio de texto sin cerrar el archivo
+    size = spool.tell()
+    spool.seek(0)
+    return spool, count, size
+
+@bot.tree.command(name="tt-export", description=command_text('command_export_desc'))
+@discord.app_commands.describe(
+    export_format=command_text('command_export_format_desc')
+)
+@app_commands.rename(export_format='format')
+@app_commands.choices(export_format=[
+    app_commands.Choice(name="CSV", value="csv"),
+    app_commands.Choice(name="JSON Lines", value="jsonl"),
+])
+async def tt_export(interaction: discord.Interaction, export_format: str = 'csv'):
+    await interaction.response.defer(ephemeral=True) # Respuesta solo visible para el usuario
+
+    if not interaction.guild:
+        await interaction.followup.send(get_localized_string(None, "response_guild_only"))
+        return
+
+    guild_id = str(interaction.guild.id)
+    async with guild_store.lock(guild_id):
+        current_guild_data = await load_guild_data(guild_id)
+        tr = get_localizer(guild_id)
+        track_count = sum(1 for value in current_guild_data.values() if isinstance(value, list) and value)
+        captured_tracks = capture_export_tracks(guild_id, current_guild_data) if track_count else None
+    if not track_count:
+        await interaction.followup.send(tr("export_no_data"))
+        return
+
+    # Formatear y escribir el archivo (lo costoso) en un hilo de exportación, con la copia y sin bloquear el bucle
+    loop = asyncio.get_running_loop()
+    spool, row_count, size = await loop.run_in_executor(EXPORT_EXECUTOR, write_export, iter_export_rows(captured_tracks), export_format)
+    with spool:
+        limit = interaction.guild.filesize_limit
+        if size > limit:
+            await interaction.followup.send(tr("export_too_large", size_kb=size // 1024, limit_kb=limit // 1024))
+            return
+        await interaction.followup.send(
+            tr("export_ready", rows=row_count, tracks=track_count),
+            file=discord.File(spool, filename=f"tt-export-{guild_id}.{export_format}")
+        )
+
+
+# --- RANKING GLOBAL ENTRE SERVIDORES (/tt-global) ---
+# Registro de los guilds que participan en la liga: {"guilds": ["<guild_id>", ...]}
+GLOBAL_LEAGUE_PATH = os.path.join(DATA_DIR, 'global_league.json')
+GLOBAL_RANKING_CACHE_MAX_ENTRIES = 64
+
+global_league_guilds = None # Conjunto de guild_ids de la liga; se lee del registro la primera vez que se usa
+global_ranking_cache = OrderedDict() # (pista, ((guild_id, versión), ...)) -> [(entrada, guild_id), ...]
+
+def _read_global_league(path=GLOBAL_LEAGUE_PATH):
+    if not os.path.exists(path):
+        return set()
+    with open(path, 'r') as f:
+        try:
+            return set(json.load(f).get('guilds', []))
+        except json.JSONDecodeError:
+            print(f"Error al decodificar {path}. La liga global queda vacía.")
+            return set()
+
+def _write_global_league(guild_ids, path=GLOBAL_LEAGUE_PATH):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'guilds': guild_ids}, f, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+async def get_global_league():
+    global global_league_guilds
+    if global_league_guilds is None:
+        loop = asyncio.get_running_loop()
+        guild_ids = await loop.run_in_executor(GUILD_IO_EXECUTOR, _read_global_league)
+        if global_league_guilds is None: # Otra llamada pudo leerlo mientras tanto
+            global_league_guilds = guild_ids
+    return global_league_guilds
+
+async def set_global_league_member(guild_id, enabled):
+    guild_ids = await get_global_league()
+    if enabled:
+        guild_ids.add(str(guild_id))
+    else:
+        guild_ids.discard(str(guild_id))
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(GUILD_IO_EXECUTOR, _write_global_league, sorted(guild_ids))
+
+def _tag_entries(entries, guild_id):
+    for entry in entries:
+        yield entry, guild_id
+
+def merge_global_ranking(rankings):
+    """
+    Une los rankings ya ordenados de cada guild ([(guild_id, TrackRanking)])
+    con una mezcla k-way (heapq.merge) y conserva solo la primera aparición
+    de cada usuario, que es su mejor tiempo. Devuelve [(entrada, guild_id)].
+    """
+    streams = [_tag_entries(ranking.iter_entries(), guild_id) for guild_id, ranking in rankings]
+    seen = set()
+    merged = []
+    for entry, guild_id in heapq.merge(*streams, key=lambda item: (item[0].time_ms, item[0].user_id)):
+        if entry.user_id in seen:
+            continue
+        seen.add(entry.user_id)
+        merged.append((entry, guild_id))
+    return merged
+
+def get_global_ranking(storage_key, guild_datas):
+    """
+    Ranking global de una pista para los guilds dados ({guild_id: datos}).
+    Se reutiliza mientras ninguno de esos guilds cambie (la clave incluye sus versiones).
+    """
+    key = (storage_key, tuple((guild_id, guild_store.version(guild_id)) for guild_id in sorted(guild_datas)))
+    merged = global_ranking_cache.get(key)
+    if merged is not None:
+        global_ranking_cache.move_to_end(key)
+        return merged
+    merged = merge_global_ranking([
+        (guild_id, get_track_ranking(guild_id, guild_data, storage_key))
+        for guild_id, guild_data in guild_datas.items()
+        if storage_key in guild_data
+    ])
+    global_ranking_cache[key] = merged
+    while len(global_ranking_cache) > GLOBAL_RANKING_CACHE_MAX_ENTRIES:
+        global_ranking_cache.popitem(last=False)
+    return merged
+
+def render_global_page(tr, lang, storage_key, merged, guild_count, page):
+    """Embed de una página del ranking global. Devuelve (embed, página, total de páginas)."""
+    pages = max(1, -(-len(merged) // TTSHOW_PAGE_SIZE))
+    page = min(max(page, 1), pages)
+    start = (page - 1) * TTSHOW_PAGE_SIZE
+
+    COL_RANK_WIDTH = 4
+    COL_DRIVER_WIDTH = 15
+    COL_TIME_WIDTH = 11
+    COL_SERVER_WIDTH = 15
+
+    def cell(text, width):
+        if len(text) > width:
+            text = text[:width-3] + "..."
+        return f"{text:<{width}}"
+
+    table_rows = [
+        " | ".join([cell(tr('ttshow_col_rank'), COL_RANK_WIDTH), cell(tr('ttshow_col_pilot'), COL_DRIVER_WIDTH),
+                    cell(tr('ttshow_col_time'), COL_TIME_WIDTH), cell(tr('global_col_server'), COL_SERVER_WIDTH)]),
+        "-|-".join(['-'*COL_RANK_WIDTH, '-'*COL_DRIVER_WIDTH, '-'*COL_TIME_WIDTH, '-'*COL_SERVER_WIDTH]),
+    ]
+    for offset, (entry, guild_id) in enumerate(merged[start:start + TTSHOW_PAGE_SIZE]):
+        guild = bot.get_guild(int(guild_id))
+        table_rows.append(" | ".join([
+            cell(f"{start + offset + 1}.", COL_RANK_WIDTH),
+            cell(entry.user_name or entry.user_id, COL_DRIVER_WIDTH),
+            cell(entry.time, COL_TIME_WIDTH),
+            cell(guild.name if guild is not None else guild_id, COL_SERVER_WIDTH),
+        ]))
+
+    description = "```ansi\n" + "\n".join(table_rows) + "\n```"
+    if not merged:
+        description += "\n" + tr("global_no_times")
+    embed = discord.Embed(
+        title=tr("global_title", track_name=get_display_track_name(storage_key, lang)),
+        description=description,
+        color=discord.Color.blue()
+    )
+    embed.set_footer(text=f"{tr('global_footer', guilds=guild_count)}\n{tr('ttshow_page', page=page, pages=pages)}")
+    return embed, page, pages
+
+@bot.tree.command(name="tt-global", description=command_text('command_global_desc'))
+@app_commands.autocomplete(track_name=track_name_autocomplete)
+@discord.app_commands.describe(
+    track_name=command_text('command_global_track_name_desc'),
+    page=command_text('command_global_page_desc')
+)
+async def tt_global(interaction: discord.Interaction, track_name: str, page: int = 1):
+    await interaction.response.defer()
+
+    guild_id = str(interaction.guild.id) if interaction.guild else None
+    tr = await load_localizer(guild_id) # El guild que pregunta puede no estar en la liga ni en caché
+    league = await get_global_league()
+    if not league:
+        await interaction.followup.send(tr("global_no_guilds"))
+        return
+
+    # Los guilds de la liga salen de la caché en memoria; solo se leen de disco los que no estén cargados
+    guild_ids = sorted(league)
+    guild_datas = dict(zip(guild_ids, await asyncio.gather(*(load_guild_data(league_guild_id) for league_guild_id in guild_ids))))
+
+    storage_key = normalize_track_name(track_name)
+    merged = get_global_ranking(storage_key, guild_datas)
+    embed, _, _ = render_global_page(tr, get_guild_language(guild_id), storage_key, merged, len(guild_ids), page)
+    await interaction.followup.send(embed=embed)
+
+@bot.tree.command(name="tt-global-optin", description=command_text('command_global_optin_desc'))
+@discord.app_commands.describe(
+    enabled=command_text('command_global_optin_enabled_desc')
+)
+@app_commands.default_permissions(manage_guild=True) # Solo administradores del servidor
+async def tt_global_optin(interaction: discord.Interaction, enabled: bool):
+    await interaction.response.defer(ephemeral=True) # Respuesta solo visible para el usuario
+
+    if not interaction.guild:
+        await interaction.followup.send(get_localized_string(None, "response_guild_only"))
+        return
+
+    guild_id = str(interaction.guild.id)
+    tr = await load_localizer(guild_id)
+    if not interaction.user.guild_permissions.manage_guild:
+        await interaction.followup.send(tr("response_admin_only"))
+        return
+
+    await set_global_league_member(guild_id, enabled)
+    await interaction.followup.send(tr("global_optin_enabled" if enabled else "global_optin_disabled"))
+
+
+# --- ESTADÍSTICAS POR PISTA ---
+STATS_PERCENTILES = (10, 25, 75, 90)
+STATS_HISTOGRAM_BINS = 10
+STATS_HISTOGRAM_BAR_WIDTH = 20
+
+def render_track_stats(tr, lang, storage_key, times):
+    """Embed con el resumen, percentiles e histograma de los tiempos (array ordenado) de una pista."""
+    def fmt(time_ms):
+        return format_time_ms(int(round(float(time_ms))))
+
+    best = times[0]
+    mean = times.mean()
+    median = np.median(times)
+    summary = tr("stats_summary", count=len(times), best=fmt(best),
+                 mean=fmt(mean), mean_gap=fmt(mean - best),
+                 median=fmt(median), median_gap=fmt(median - best),
+                 std=fmt(times.std()))
+    percentiles = "\n".join(
+        f"P{pct}: `{fmt(value)}` (+{fmt(value - best)})"
+        for pct, value in zip(STATS_PERCENTILES, np.percentile(times, STATS_PERCENTILES))
+    )
+
+    # Histograma de texto: una barra por intervalo, escalada al intervalo más poblado
+    counts, edges = np.histogram(times, bins=min(STATS_HISTOGRAM_BINS, len(times)))
+    bars = np.ceil(counts * STATS_HISTOGRAM_BAR_WIDTH / counts.max()).astype(int)
+    labels = [fmt(edge) for edge in edges[:-1]]
+    label_width = max(len(label) for label in labels)
+    histogram_rows = [
+        f"{label:>{label_width}} | {'█' * bar:<{STATS_HISTOGRAM_BAR_WIDTH}} {count}"
+        for label, bar, count in zip(labels, bars, counts)
+    ]
+
+    embed = discord.Embed(
+        title=tr("stats_title", track_name=get_display_track_name(storage_key, lang)),
+        color=discord.Color.blue()
+    )
+    embed.add_field(name=tr("stats_summary_name"), value=summary, inline=True)
+    embed.add_field(name=tr("stats_percentiles_name"), value=percentiles, inline=True)
+    embed.add_field(name=tr("stats_histogram_name"), value="```\n" + "\n".join(histogram_rows) + "\n```", inline=False)
+    embed.set_footer(text=tr("stats_footer"))
+    return embed
+
+def caller_stats_line(tr, times, entry):
+    """Puesto y percentil del tiempo del usuario dentro del array ordenado de la pista."""
+    if entry is None:
+        return tr("stats_caller_no_time")
+    count = len(times)
+    rank = int(np.searchsorted(times, entry.time_ms, side='left')) + 1
+    slower = count - int(np.searchsorted(times, entry.time_ms, side='right'))
+    percentile = 100 * slower / (count - 1) if count > 1 else 100.0
+    return tr("stats_caller", time=entry.time, rank=rank, count=count,
+              gap=format_time_ms(entry.time_ms - int(times[0])), percentile=percentile)
+
+@bot.tree.command(name="tt-stats", description=command_text('command_stats_desc'))
+@app_commands.autocomplete(track_name=track_name_autocomplete)
+@discord.app_commands.describe(
+    track_name=command_text('command_stats_track_name_desc')
+)
+async def tt_stats(interaction: discord.Interaction, track_name: str):
+    await interaction.response.defer()
+
+    guild_id = str(interaction.guild.id) if interaction.guild else None
+    if not guild_id:
+        await interaction.followup.send(get_localized_string(None, "response_guild_only"))
+        return
+
+    storage_key = normalize_track_name(track_name)
+    current_guild_data = await load_guild_data(guild_id)
+    tr = get_localizer(guild_id) # Después de cargar: el embed se guarda en caché bajo el idioma del guild
+    times = get_track_times_array(guild_id, current_guild_data, storage_key)
+    if not len(times):
+        await interaction.followup.send(tr("ttshow_no_times"))
+        return
 
-    await interaction.followup.send(get_localized_string(guild_id, "language_set_success"))
+    lang = get_guild_language(guild_id)
+    # El embed es igual para todos hasta el próximo cambio del guild; la línea del usuario va aparte
+    embed = cached_render(guild_id, ('tt-stats', storage_key, lang), lambda: render_track_stats(tr, lang, storage_key, times))
+    entry = get_track_ranking(guild_id, current_guild_data, storage_key).entry_of(str(interaction.user.id))
+    await interaction.followup.send(caller_stats_line(tr, times, entry), embed=embed)
 
 
 # Iniciar el bot
 if __name__ == "__main__":
-    if not TOKEN:
+    if '--migrate-sqlite' in sys.argv:
+        # Uso: python bot.py --migrate-sqlite  (copia data/*.json a TT_SQLITE_PATH)
+        migrate_json_to_sqlite()
+    elif not TOKEN:
         print(get_localized_string(None, "error_token_not_found"))
     else:
         bot.run(TOKEN)
+        # Escribir cualquier cambio pendiente antes de salir
+        guild_store.flush_sync()